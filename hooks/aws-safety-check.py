@@ -5,17 +5,147 @@ AWS Safety Check Hook - AWS操作安全检查
 """
 
 import sys
-import json
 import re
 import os
+import configparser
+
+from hook_utils import (
+    file_signature,
+    filter_advisories,
+    load_cache,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+)
+
+# 生产环境账号ID，也可以通过环境变量 CLAUDE_AWS_PROD_ACCOUNTS（逗号分隔）配置
+PRODUCTION_ACCOUNT_IDS = []
+
+PROFILE_FIELDS = [
+    "region",
+    "role_arn",
+    "source_profile",
+    "sso_account_id",
+    "sso_role_name",
+    "aws_account_id",
+]
+
+
+def get_production_accounts():
+    """返回配置的生产账号ID集合"""
+    accounts = set(PRODUCTION_ACCOUNT_IDS)
+    for account in os.environ.get("CLAUDE_AWS_PROD_ACCOUNTS", "").split(","):
+        if account.strip():
+            accounts.add(account.strip())
+    return accounts
+
+
+def parse_aws_profiles(config_path, credentials_path):
+    """解析 ~/.aws/config 和 ~/.aws/credentials，返回 profile -> {account, region, role} 映射"""
+    raw = {}
+    for path, is_config in ((credentials_path, False), (config_path, True)):
+        parser = configparser.RawConfigParser(strict=False)
+        try:
+            parser.read(path, encoding="utf-8")
+        except (configparser.Error, UnicodeDecodeError):
+            continue
+
+        for section in parser.sections():
+            if not is_config or section == "default":
+                name = section
+            elif section.startswith("profile "):
+                name = section[len("profile ") :].strip()
+            else:
+                # sso-session、services 等不是profile
+                continue
+
+            entry = raw.setdefault(name, {})
+            for field in PROFILE_FIELDS:
+                value = parser.get(section, field, fallback=None)
+                if value:
+                    entry[field] = value.strip()
+
+    def resolve(name, field, depth=0):
+        """沿 source_profile 链查找账号字段（region等其他配置不会沿链继承）"""
+        entry = raw.get(name, {})
+        if field in entry or depth > 5 or "source_profile" not in entry:
+            return entry.get(field)
+        return resolve(entry["source_profile"], field, depth + 1)
+
+    profiles = {}
+    for name, entry in raw.items():
+        account = entry.get("aws_account_id") or entry.get("sso_account_id")
+        role = entry.get("role_arn") or entry.get("sso_role_name")
+        if not account and entry.get("role_arn"):
+            match = re.search(r":iam::(\d{12}):", entry["role_arn"])
+            account = match.group(1) if match else None
+        if not account:
+            account = resolve(name, "aws_account_id") or resolve(name, "sso_account_id")
+
+        profiles[name] = {
+            "account": account,
+            "region": entry.get("region"),
+            "role": role,
+        }
+
+    return profiles
+
+
+def load_aws_profiles():
+    """读取profile映射，按配置文件mtime缓存，文件未变化时不重新解析"""
+    config_path = os.environ.get("AWS_CONFIG_FILE") or os.path.expanduser(
+        "~/.aws/config"
+    )
+    credentials_path = os.environ.get(
+        "AWS_SHARED_CREDENTIALS_FILE"
+    ) or os.path.expanduser("~/.aws/credentials")
+    paths = [config_path, credentials_path]
+    signature = file_signature(paths)
+
+    cache = load_cache("aws-profiles")
+    if cache.get("paths") == paths and cache.get("signature") == signature:
+        return cache.get("profiles", {})
+
+    profiles = parse_aws_profiles(config_path, credentials_path)
+    save_cache(
+        "aws-profiles",
+        {"paths": paths, "signature": signature, "profiles": profiles},
+    )
+    return profiles
+
+
+def resolve_profile(command):
+    """确定命令实际使用的profile，返回 (profile名称, 来源)"""
+    match = re.search(r"--profile[=\s]+['\"]?([^\s;|&'\"]+)", command)
+    if match:
+        return match.group(1), "--profile"
+
+    match = re.search(r"(?:^|\s)AWS_PROFILE=['\"]?([^\s;|&'\"]+)", command)
+    if match:
+        return match.group(1), "AWS_PROFILE"
+
+    for var in ("AWS_PROFILE", "AWS_DEFAULT_PROFILE"):
+        if os.environ.get(var):
+            return os.environ[var], var
+
+    return None, None
 
 
 def check_aws_command(command):
     """检查AWS命令的安全性"""
     messages = []
 
-    # 检查是否设置了配置文件
-    if "aws" in command and "--profile" not in command:
+    profile, source = resolve_profile(command)
+    profile_info = load_aws_profiles().get(profile or "default", {})
+    # 环境变量中的凭证优先于profile（--profile参数除外），此时无法从profile得知账号
+    env_credentials = source != "--profile" and (
+        "AWS_ACCESS_KEY_ID" in os.environ
+        or re.search(r"(?:^|\s)AWS_ACCESS_KEY_ID=", command)
+    )
+
+    # 检查是否设置了配置文件（环境变量已指定profile或凭证时不再提示）
+    if profile is None and not env_credentials:
         messages.append("💡 建议: 使用 --profile 参数明确指定AWS配置文件")
 
     # 危险操作检查
@@ -33,12 +163,22 @@ def check_aws_command(command):
         if re.search(pattern, command, re.IGNORECASE):
             messages.append(f"⚠️ 危险操作: {warning}")
 
-    # 生产环境检查
-    prod_indicators = ["prod", "production", "prd"]
-    for indicator in prod_indicators:
-        if indicator in command.lower():
-            messages.append("🚨 警告: 可能在操作生产环境，请格外小心")
-            break
+    # 生产环境检查：优先根据profile解析出的真实账号判断
+    prod_accounts = get_production_accounts()
+    account = None if env_credentials else profile_info.get("account")
+    if prod_accounts and account:
+        if account in prod_accounts:
+            messages.append(
+                f"🚨 警告: 目标为生产账号 {account}（profile: {profile or 'default'}，"
+                f"来源: {source or '默认'}），请格外小心"
+            )
+    else:
+        prod_indicators = ["prod", "production", "prd"]
+        target = f"{command} {profile or ''}".lower()
+        for indicator in prod_indicators:
+            if indicator in target:
+                messages.append("🚨 警告: 可能在操作生产环境，请格外小心")
+                break
 
     # S3操作检查
     if "s3" in command:
@@ -77,8 +217,15 @@ def check_aws_command(command):
             messages.append("💰 成本提醒: 此操作会产生AWS费用，请注意成本控制")
             break
 
-    # 区域检查
-    if "--region" not in command and "AWS_DEFAULT_REGION" not in os.environ:
+    # 区域检查（命令参数、环境变量或profile中配置了区域时不提示）
+    region_configured = (
+        "--region" in command
+        or "AWS_REGION" in os.environ
+        or "AWS_DEFAULT_REGION" in os.environ
+        or re.search(r"(?:^|\s)AWS_(?:DEFAULT_)?REGION=", command)
+        or profile_info.get("region")
+    )
+    if not region_configured:
         messages.append("💡 建议: 使用 --region 参数明确指定AWS区域")
 
     return messages
@@ -87,24 +234,25 @@ def check_aws_command(command):
 def main():
     """主函数"""
     try:
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Bash命令
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool != "Bash":
             sys.exit(0)
 
         # 获取命令
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         command = arguments.get("command", "")
 
         # 检查AWS命令
         if "aws " in command:
             messages = check_aws_command(command)
+            messages = filter_advisories(tool_use, "aws-safety-check", messages)
             if messages:
                 # 输出警告信息到stdout，不阻止操作
                 print("\n".join(messages))
+                record_metric("aws-safety-check", "warn")
 
         # 总是允许操作
         sys.exit(0)
@@ -115,4 +263,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "aws-safety-check")
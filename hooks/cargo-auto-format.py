@@ -5,8 +5,34 @@ Cargo Auto Format Hook - 自动格式化和检查Rust代码
 """
 
 import sys
-import json
 import os
+import re
+import glob
+import platform
+import shutil
+
+from hook_utils import (
+    file_signature,
+    filter_advisories,
+    load_cache,
+    prune_oldest,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+)
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 没有tomllib，跳过编译性能分析
+    tomllib = None
+
+# 成员数达到该值视为大型workspace
+LARGE_WORKSPACE_MEMBERS = 10
+# 缓存中最多保留的workspace数
+MAX_CACHED_WORKSPACES = 100
+# 取决于命令而不是配置的问题ID
+COMMAND_ISSUES = {"build-vs-check"}
 
 
 def should_run_format(command):
@@ -15,29 +41,228 @@ def should_run_format(command):
     return any(cmd in command for cmd in cargo_commands)
 
 
+def read_toml(path):
+    """读取TOML文件，不存在或解析失败时返回空字典"""
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return {}
+
+
+def find_workspace_root(start):
+    """向上查找workspace根目录，没有workspace时返回最近的Cargo.toml所在目录"""
+    path = os.path.abspath(start)
+    nearest = None
+    while True:
+        manifest = os.path.join(path, "Cargo.toml")
+        if os.path.isfile(manifest):
+            nearest = nearest or path
+            try:
+                with open(manifest, "r", encoding="utf-8") as f:
+                    if re.search(r"^\s*\[workspace\]", f.read(), re.MULTILINE):
+                        return path
+            except OSError:
+                pass
+        parent = os.path.dirname(path)
+        if parent == path:
+            return nearest
+        path = parent
+
+
+def config_files(root):
+    """影响编译性能的配置文件（workspace清单、项目和用户级cargo配置）"""
+    cargo_home = os.environ.get("CARGO_HOME") or os.path.expanduser("~/.cargo")
+    return [
+        os.path.join(root, "Cargo.toml"),
+        os.path.join(root, ".cargo", "config.toml"),
+        os.path.join(root, ".cargo", "config"),
+        os.path.join(cargo_home, "config.toml"),
+    ]
+
+
+def parse_workspace(root):
+    """解析workspace布局和编译相关配置"""
+    manifest = read_toml(os.path.join(root, "Cargo.toml"))
+    workspace = manifest.get("workspace", {})
+
+    members = set()
+    for pattern in workspace.get("members", []):
+        for path in glob.glob(os.path.join(root, pattern)):
+            if os.path.isfile(os.path.join(path, "Cargo.toml")):
+                members.add(os.path.relpath(path, root))
+    members -= set(workspace.get("exclude", []))
+
+    # 合并cargo配置中的 rustc-wrapper / linker / rustflags
+    rustc_wrapper = None
+    linker_configured = False
+    for path in config_files(root)[1:]:
+        config = read_toml(path)
+        build = config.get("build", {})
+        rustc_wrapper = rustc_wrapper or build.get("rustc-wrapper")
+        flags = [build.get("rustflags", [])]
+        for target in config.get("target", {}).values():
+            if isinstance(target, dict):
+                linker_configured = linker_configured or "linker" in target
+                flags.append(target.get("rustflags", []))
+        flags_text = " ".join(
+            " ".join(flag) if isinstance(flag, list) else str(flag) for flag in flags
+        )
+        if "fuse-ld" in flags_text or "linker=" in flags_text:
+            linker_configured = True
+
+    dev = manifest.get("profile", {}).get("dev", {})
+    all_deps = dev.get("package", {}).get("*", {})
+
+    return {
+        "members": max(len(members), 1),
+        "rustc_wrapper": rustc_wrapper,
+        "linker_configured": linker_configured,
+        "dev_debug": dev.get("debug"),
+        "split_debuginfo": "split-debuginfo" in dev,
+        "deps_opt_level": all_deps.get("opt-level"),
+    }
+
+
+def find_build_issues(parsed, command):
+    """根据解析结果找出编译性能问题，返回 {问题ID: 提示}"""
+    issues = {}
+    is_linux = platform.system() == "Linux"
+
+    if not parsed["rustc_wrapper"] and not os.environ.get("RUSTC_WRAPPER"):
+        if shutil.which("sccache"):
+            issues["sccache"] = (
+                "已安装sccache但未启用，设置 RUSTC_WRAPPER=sccache "
+                "或在 .cargo/config.toml 的 [build] 中配置 rustc-wrapper"
+            )
+        else:
+            issues["sccache"] = (
+                "未配置编译缓存，建议安装sccache并设置 RUSTC_WRAPPER=sccache"
+            )
+
+    if (
+        is_linux
+        and not parsed["linker_configured"]
+        and "fuse-ld" not in os.environ.get("RUSTFLAGS", "")
+    ):
+        linker = (
+            "mold"
+            if shutil.which("mold")
+            else "lld" if shutil.which("ld.lld") else None
+        )
+        if linker:
+            issues["linker"] = (
+                f"正在使用默认链接器，系统已安装{linker}，在 .cargo/config.toml 中添加 "
+                f'rustflags = ["-C", "link-arg=-fuse-ld={linker}"] 可显著缩短链接时间'
+            )
+
+    if parsed["members"] >= LARGE_WORKSPACE_MEMBERS and parsed["dev_debug"] in (
+        None,
+        True,
+        2,
+        "full",
+    ):
+        issues["dev-debug"] = (
+            f"workspace有{parsed['members']}个成员且dev profile生成完整调试信息，"
+            '建议在 [profile.dev] 中设置 debug = "line-tables-only"'
+        )
+
+    if is_linux and not parsed["split_debuginfo"]:
+        issues["split-debuginfo"] = (
+            '未设置split-debuginfo，在 [profile.dev] 中设置 split-debuginfo = "unpacked" 可减少链接开销'
+        )
+
+    if parsed["deps_opt_level"] == 3:
+        issues["deps-opt-level"] = (
+            '[profile.dev.package."*"] 对所有依赖使用 opt-level = 3，会大幅增加冷编译时间，'
+            "建议只对性能关键的crate开启或改为 opt-level = 1"
+        )
+
+    if (
+        re.search(r"cargo\s+build\b", command)
+        and "--release" not in command
+        and "target/" not in command
+    ):
+        issues["build-vs-check"] = (
+            "只需要检查能否编译时，cargo check 比 cargo build 快得多（不生成代码）"
+        )
+
+    return issues
+
+
+def check_build_performance(command):
+    """分析workspace的编译性能问题，每个问题在每个workspace中只提示一次
+
+    已提示的问题与解析结果一起缓存。配置文件变化后重新解析，并从已提示列表中移除不再出现的问题，
+    修复后又重新出现的问题会再次提示，仍存在的问题不会重复提示。
+    """
+    if tomllib is None:
+        return []
+
+    root = find_workspace_root(".")
+    if not root:
+        return []
+
+    signature = file_signature(config_files(root))
+    cache = load_cache("cargo-auto-format")
+    entry = cache.get(root)
+    reparsed = not entry or entry.get("signature") != signature
+    if reparsed:
+        entry = {
+            "signature": signature,
+            "parsed": parse_workspace(root),
+            "emitted": entry.get("emitted", []) if entry else [],
+        }
+
+    issues = find_build_issues(entry["parsed"], command)
+    if reparsed:
+        # 只取决于本次命令的问题不因配置变化而移除
+        entry["emitted"] = [
+            issue_id
+            for issue_id in entry["emitted"]
+            if issue_id in issues or issue_id in COMMAND_ISSUES
+        ]
+    new_ids = [issue_id for issue_id in issues if issue_id not in entry["emitted"]]
+
+    if new_ids or cache.get(root) is not entry:
+        entry["emitted"] = entry["emitted"] + new_ids
+        cache.pop(root, None)
+        cache[root] = entry
+        prune_oldest(cache, MAX_CACHED_WORKSPACES)
+        save_cache("cargo-auto-format", cache)
+
+    return [f"🦀 编译性能: {issues[issue_id]}" for issue_id in new_ids]
+
+
 def main():
     """主函数"""
     try:
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Bash命令
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool != "Bash":
             sys.exit(0)
 
         # 获取命令
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         command = arguments.get("command", "")
 
         # 如果是cargo相关命令，提醒格式化
         if should_run_format(command):
+            messages = []
             # 检查是否是Rust项目
             if os.path.exists("./Cargo.toml"):
-                print(
+                messages.append(
                     "💡 提示: 构建完成后建议运行 'cargo fmt' 和 'cargo clippy' 检查代码质量"
                 )
 
+            messages.extend(check_build_performance(command))
+            messages = filter_advisories(tool_use, "cargo-auto-format", messages)
+            if messages:
+                print("\n".join(messages))
+                record_metric("cargo-auto-format", "warn")
+
         # 总是允许操作
         sys.exit(0)
 
@@ -47,4 +272,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "cargo-auto-format")
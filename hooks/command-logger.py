@@ -2,38 +2,33 @@
 """
 Command Logger Hook - 命令日志记录
 记录所有执行的命令到日志文件，方便回溯和审计
+命令中的密钥（AWS密钥、令牌等）会替换为 [REDACTED:<类型>] 后再写入
 """
 
 import sys
-import json
 import os
-from datetime import datetime
+
+from hook_utils import append_log, read_payload, redact_secrets, run_hook
 
 
 def log_command(tool_use):
     """记录命令到日志文件"""
     try:
         log_dir = os.path.expanduser("~/.claude/logs")
-        os.makedirs(log_dir, exist_ok=True)
-
-        log_file = os.path.join(
-            log_dir, f"commands_{datetime.now().strftime('%Y%m%d')}.log"
-        )
 
-        # 构建日志条目
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        tool = tool_use.get("tool") or tool_use.get("tool_name", "Unknown")
+        # 构建日志条目（timestamp由append_log添加）
+        tool = tool_use.get("tool_name") or tool_use.get("tool", "Unknown")
 
         log_entry = {
-            "timestamp": timestamp,
             "tool": tool,
         }
 
         # 根据工具类型记录不同信息
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
 
         if tool == "Bash":
-            log_entry["command"] = arguments.get("command", "")
+            # 命令中的密钥脱敏后再落盘
+            log_entry["command"] = redact_secrets(arguments.get("command", ""))
         elif tool in ["Write", "Edit", "MultiEdit"]:
             log_entry["file"] = arguments.get("file_path", "")
         elif tool == "Read":
@@ -43,8 +38,7 @@ def log_command(tool_use):
             log_entry["path"] = arguments.get("path", ".")
 
         # 写入日志
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        append_log(log_dir, "commands", log_entry)
 
     except Exception:
         # 日志记录失败不应阻止命令执行
@@ -54,8 +48,7 @@ def log_command(tool_use):
 def main():
     """主函数"""
     try:
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         log_command(tool_use)
 
@@ -68,4 +61,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "command-logger")
@@ -5,9 +5,10 @@ Commit Message Filter Hook - 过滤提交消息中的特定内容
 """
 
 import sys
-import json
 import re
 
+from hook_utils import block, read_payload, run_hook
+
 
 def check_commit_message(command):
     """检查提交消息是否包含需要过滤的内容"""
@@ -27,15 +28,13 @@ def check_commit_message(command):
                 error_msg = (
                     "❌ 提交消息包含自动生成的Claude标识，请使用自定义的提交消息"
                 )
-                print(error_msg, file=sys.stderr)
-                sys.exit(2)  # Exit code 2 = blocking error
+                block("commit-message-filter", error_msg)
 
 
 def main():
     """主函数"""
     # 从stdin读取hook数据
-    tool_use_json = sys.stdin.read()
-    tool_use = json.loads(tool_use_json)
+    tool_use = read_payload()
 
     # 只处理Bash命令
     if tool_use.get("tool_name") != "Bash":
@@ -51,4 +50,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "commit-message-filter")
@@ -5,10 +5,10 @@
 """
 
 import sys
-import json
 import os
 import re
-from datetime import datetime
+
+from hook_utils import append_log, read_payload, redact_secrets, run_hook
 
 
 def detect_event_from_command(command):
@@ -48,23 +48,17 @@ def log_event(event_type, description, command):
     """记录事件到日志文件"""
     try:
         log_dir = os.path.expanduser("~/.claude/logs/events")
-        os.makedirs(log_dir, exist_ok=True)
-
-        log_file = os.path.join(
-            log_dir, f"events_{datetime.now().strftime('%Y%m%d')}.log"
-        )
 
         log_entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "event_type": event_type,
             "description": description,
-            "command": command,
+            # 命令中的密钥脱敏后再落盘
+            "command": redact_secrets(command),
             "user": os.environ.get("USER", "Unknown"),
             "cwd": os.getcwd(),
         }
 
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        append_log(log_dir, "events", log_entry)
 
     except Exception:
         # 日志记录失败不应阻止命令执行
@@ -75,16 +69,15 @@ def main():
     """主函数"""
     try:
         # 从stdin读取hook数据
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Bash命令
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool != "Bash":
             sys.exit(0)
 
         # 获取命令
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         command = arguments.get("command", "")
 
         # 检测事件类型
@@ -116,4 +109,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "dev-event-notifier")
@@ -1,7 +1,275 @@
 #!/usr/bin/env python3
 import sys
-import json
 import re
+import os
+import shlex
+import time
+
+from hook_utils import (
+    MB,
+    block,
+    file_signature,
+    format_size,
+    load_cache,
+    prune_oldest,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+    tree_stats,
+)
+
+# 没有 .dockerignore 时，构建上下文超过此大小会提示
+LARGE_CONTEXT_BYTES = 100 * MB
+# 统计构建上下文大小的时间预算（秒），超出后按已统计的部分判断
+CONTEXT_SCAN_BUDGET = 0.5
+# 构建上下文大小的缓存有效期（秒）
+CONTEXT_CACHE_TTL = 600
+# 缓存中最多保留的Dockerfile/上下文条目数
+MAX_CACHE_ENTRIES = 200
+
+# docker build 中需要取值的参数
+BUILD_VALUE_OPTIONS = {
+    "-f",
+    "--file",
+    "-t",
+    "--tag",
+    "--build-arg",
+    "--target",
+    "--platform",
+    "--label",
+    "--cache-from",
+    "--cache-to",
+    "--secret",
+    "--ssh",
+    "--network",
+    "--progress",
+    "-o",
+    "--output",
+    "--add-host",
+    "--iidfile",
+    "--build-context",
+    "--shm-size",
+    "--ulimit",
+    "-m",
+    "--memory",
+    "--memory-swap",
+    "--cpu-shares",
+    "--cpuset-cpus",
+    "--isolation",
+    "--builder",
+    "--metadata-file",
+    "--attest",
+    "--sbom",
+    "--provenance",
+    "--annotation",
+    "--allow",
+    "--cgroup-parent",
+}
+
+# 安装或预先下载依赖的RUN指令（yarn build、cargo build、mvn package等构建命令不算）
+DEPENDENCY_INSTALL_PATTERN = re.compile(
+    r"\b(npm\s+(install|ci|i)\b|pnpm\s+(install|i)\b|pip3?\s+install"
+    r"|yarn(\s+(install|add)\b|\s+--(frozen-lockfile|immutable|pure-lockfile|production)\b"
+    r"|\s*($|[;&|]))"
+    r"|poetry\s+install|uv\s+(sync|pip\s+install)|bundle\s+install"
+    r"|composer\s+install|go\s+mod\s+download|cargo\s+(fetch|chef\s+cook)\b"
+    r"|(mvn|mvnw)\b[^;&|]*\bdependency:(go-offline|resolve)"
+    r"|(gradle|gradlew)\b[^;&|]*\sdependencies\b)",
+    re.IGNORECASE,
+)
+
+
+def parse_build_args(command):
+    """解析docker build命令，返回 (Dockerfile路径, 构建上下文路径)，无法解析时返回 (None, None)"""
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None, None
+
+    start = None
+    for i in range(len(tokens) - 1):
+        if tokens[i] != "docker":
+            continue
+        if tokens[i + 1] == "build":
+            start = i + 2
+        elif tokens[i + 1] in ("buildx", "image") and tokens[i + 2 : i + 3] == [
+            "build"
+        ]:
+            start = i + 3
+        if start is not None:
+            break
+
+    if start is None:
+        return None, None
+
+    dockerfile = None
+    context = None
+    i = start
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ("&&", "||", ";", "|"):
+            break
+        if token in ("-f", "--file") and i + 1 < len(tokens):
+            dockerfile = tokens[i + 1]
+        elif token.startswith("--file="):
+            dockerfile = token.split("=", 1)[1]
+
+        if token in BUILD_VALUE_OPTIONS:
+            i += 2
+            continue
+        if not token.startswith("-") and context is None:
+            context = token
+        i += 1
+
+    if (
+        context is None
+        or context == "-"
+        or "://" in context
+        or context.startswith("git@")
+    ):
+        return None, None
+    if dockerfile == "-":
+        return None, None
+    if dockerfile is None:
+        dockerfile = os.path.join(context, "Dockerfile")
+    return os.path.abspath(dockerfile), os.path.abspath(context)
+
+
+def parse_dockerfile(path):
+    """解析Dockerfile，返回 [(行号, 指令, 参数)]，处理续行和注释"""
+    instructions = []
+    buffer = ""
+    start_line = None
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_no, line in enumerate(f, 1):
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if start_line is None:
+                start_line = line_no
+            if stripped.endswith("\\"):
+                buffer += stripped[:-1] + " "
+                continue
+            buffer += stripped
+            parts = buffer.split(None, 1)
+            instructions.append(
+                (start_line, parts[0].upper(), parts[1] if len(parts) > 1 else "")
+            )
+            buffer = ""
+            start_line = None
+    return instructions
+
+
+def analyze_dockerfile(path):
+    """检查破坏层缓存的写法，返回提示信息列表"""
+    issues = []
+    copy_all_line = None
+    deps_installed = False
+
+    for line_no, instruction, args in parse_dockerfile(path):
+        if instruction == "FROM":
+            # 新的构建阶段
+            copy_all_line = None
+            deps_installed = False
+            continue
+
+        if instruction in ("COPY", "ADD"):
+            sources = [arg for arg in args.split() if not arg.startswith("--")][:-1]
+            if (
+                copy_all_line is None
+                and not deps_installed
+                and any(src in (".", "./") for src in sources)
+            ):
+                copy_all_line = line_no
+            if instruction == "ADD" and any(
+                src.startswith(("http://", "https://")) for src in sources
+            ):
+                issues.append(
+                    f"第{line_no}行 ADD 远程URL: 每次构建都会重新下载且难以命中缓存，"
+                    "建议使用 RUN curl 并校验checksum，或 ADD --checksum"
+                )
+
+        if instruction == "RUN":
+            if re.search(r"apt-get\s+update", args) and not re.search(
+                r"apt-get\s+(-\S+\s+)*install", args
+            ):
+                issues.append(
+                    f"第{line_no}行 apt-get update 单独成层: 缓存的索引会过期，"
+                    "请与 apt-get install 写在同一个RUN中"
+                )
+            if DEPENDENCY_INSTALL_PATTERN.search(args):
+                if copy_all_line is not None and not deps_installed:
+                    issues.append(
+                        f"第{copy_all_line}行 COPY . 位于依赖安装（第{line_no}行）之前: "
+                        "任何源码改动都会使依赖层缓存失效，建议先只复制依赖清单"
+                        "（package.json、requirements.txt、Cargo.toml等）安装依赖，再复制源码"
+                    )
+                deps_installed = True
+
+    return issues
+
+
+def check_build_cache(command):
+    """分析docker build将使用的Dockerfile和构建上下文，返回层缓存相关提示"""
+    dockerfile, context = parse_build_args(command)
+    if not dockerfile or not os.path.isfile(dockerfile):
+        return []
+
+    cache = load_cache("docker-validator")
+    dockerfiles = cache.setdefault("dockerfiles", {})
+    contexts = cache.setdefault("contexts", {})
+    changed = False
+
+    # Dockerfile分析结果按mtime缓存
+    signature = file_signature([dockerfile])
+    entry = dockerfiles.get(dockerfile)
+    if not entry or entry.get("signature") != signature:
+        entry = {"signature": signature, "issues": analyze_dockerfile(dockerfile)}
+        dockerfiles.pop(dockerfile, None)
+        dockerfiles[dockerfile] = entry
+        changed = True
+    messages = [f"🐳 {issue}" for issue in entry["issues"]]
+
+    # 没有 .dockerignore 时检查构建上下文大小
+    if not os.path.exists(os.path.join(context, ".dockerignore")):
+        context_mtime = file_signature([context])[0]
+        entry = contexts.get(context)
+        if (
+            not entry
+            or entry.get("signature") != context_mtime
+            or time.time() - entry.get("checked_at", 0) > CONTEXT_CACHE_TTL
+        ):
+            # 超过LARGE_CONTEXT_BYTES或时间预算后提前停止，此时大小是下限
+            _, size, complete = tree_stats(
+                context,
+                {},
+                time.time(),
+                time.monotonic() + CONTEXT_SCAN_BUDGET,
+                limit=LARGE_CONTEXT_BYTES,
+            )
+            entry = {
+                "signature": context_mtime,
+                "checked_at": time.time(),
+                "size": size,
+                "truncated": not complete,
+            }
+            contexts.pop(context, None)
+            contexts[context] = entry
+            changed = True
+        if entry["size"] > LARGE_CONTEXT_BYTES:
+            prefix = "超过 " if entry["truncated"] else ""
+            messages.append(
+                f"🐳 构建上下文{prefix}{format_size(entry['size'])} 且没有 .dockerignore: "
+                "每次构建都要发送整个目录，建议添加 .dockerignore 排除 .git、node_modules、target 等"
+            )
+
+    if changed:
+        prune_oldest(dockerfiles, MAX_CACHE_ENTRIES)
+        prune_oldest(contexts, MAX_CACHE_ENTRIES)
+        save_cache("docker-validator", cache)
+
+    return messages
 
 
 def validate_docker_command(tool_use):
@@ -28,16 +296,30 @@ def validate_docker_command(tool_use):
                     clean_name = image_name[: -len(suffix)]
                     tag_part = tag.split(":")[1] if ":" in tag else "latest"
                     error_msg = f"镜像名称不应使用'{suffix}'后缀。建议使用: {clean_name}:{tag_part}"
-                    print(error_msg, file=sys.stderr)
-                    sys.exit(2)  # Exit code 2 = blocking error
+                    block("docker-validator", error_msg)
 
+    # 检查Dockerfile中破坏层缓存的写法（只提示，不阻止）
+    if re.search(r"docker\s+(buildx\s+|image\s+)?build\b", command):
+        try:
+            messages = check_build_cache(command)
+        except Exception:
+            # 分析失败不应阻止构建
+            messages = []
+        if messages:
+            print("\n".join(messages))
+            record_metric("docker-validator", "warn")
 
-if __name__ == "__main__":
+
+def main():
+    """主函数"""
     # 读取输入
-    tool_use_json = sys.stdin.read()
-    tool_use = json.loads(tool_use_json)
+    tool_use = read_payload()
 
     validate_docker_command(tool_use)
 
     # 如果没有问题，静默退出
     sys.exit(0)
+
+
+if __name__ == "__main__":
+    run_hook(main, "docker-validator")
@@ -2,12 +2,69 @@
 """
 File Statistics Hook - 显示文件统计信息
 当文件被创建或修改时，显示行数、字符数、函数数等信息
+
+Python文件用ast解析，列出模块级导入，并标出可以延迟到函数内导入的重量级模块（pandas、torch、boto3等，
+可通过 CLAUDE_FILE_STATS_HEAVY_MODULES 追加，逗号分隔）。
+设置 CLAUDE_FILE_STATS_IMPORTTIME=1 后，在独立的子进程中用 python -X importtime 实测第三方模块的导入耗时，
+结果按解释器、模块和模块文件签名缓存在 ~/.claude/cache/file-stats-imports.json，重复编辑不会重新测量。
 """
 
 import sys
+import ast
 import json
 import os
 import re
+import subprocess
+import tempfile
+import time
+
+from hook_utils import file_signature, load_cache, read_payload, run_hook, save_cache
+
+# 启动时导入开销大的模块，模块级导入时建议延迟到使用它们的函数内
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "scipy",
+    "sklearn",
+    "matplotlib",
+    "seaborn",
+    "torch",
+    "tensorflow",
+    "keras",
+    "jax",
+    "transformers",
+    "cv2",
+    "pyarrow",
+    "polars",
+    "dask",
+    "sympy",
+    "spacy",
+    "nltk",
+    "boto3",
+    "botocore",
+]
+
+# 实测导入耗时超过该值（毫秒）的模块即使不在 HEAVY_MODULES 中也会提示
+IMPORT_SLOW_MS = 100
+# 每次运行实测导入耗时的总时间预算（秒），超出后未测量的模块留到下次
+IMPORTTIME_BUDGET = 2.0
+# 未安装的模块在该时间（秒）内不重新查找
+MISSING_TTL = 3600
+# 提示中最多列出的导入数
+MAX_LISTED_IMPORTS = 10
+
+# 在子进程中查找模块文件（find_spec不会执行模块本身）
+LOCATE_SCRIPT = """
+import importlib.util, json, sys
+origins = {}
+for name in sys.argv[1:]:
+    try:
+        spec = importlib.util.find_spec(name)
+    except Exception:
+        spec = None
+    origins[name] = spec.origin if spec else None
+print(json.dumps(origins))
+"""
 
 
 def count_functions(content, file_ext):
@@ -48,6 +105,211 @@ def count_functions(content, file_ext):
     return function_counts.get(lang, 0) if lang else 0
 
 
+def heavy_modules():
+    extra = os.environ.get("CLAUDE_FILE_STATS_HEAVY_MODULES", "")
+    return set(HEAVY_MODULES) | {
+        name.strip() for name in extra.split(",") if name.strip()
+    }
+
+
+def is_type_checking(test):
+    """判断是否为 if TYPE_CHECKING: 块，其中的导入不会在运行时执行"""
+    if isinstance(test, ast.Name):
+        return test.id == "TYPE_CHECKING"
+    return isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"
+
+
+def top_level_imports(tree):
+    """返回模块级导入的 [(顶层包名, 行号)]，按首次出现去重
+
+    包含模块级 if/try/with 中的导入，不包含函数和类内部、if TYPE_CHECKING 块中的导入以及相对导入。
+    """
+    imports = {}
+
+    def visit(body):
+        for node in body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.setdefault(alias.name.split(".")[0], node.lineno)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level == 0 and node.module and node.module != "__future__":
+                    imports.setdefault(node.module.split(".")[0], node.lineno)
+            elif isinstance(node, ast.If):
+                if not is_type_checking(node.test):
+                    visit(node.body)
+                visit(node.orelse)
+            elif isinstance(node, ast.Try):
+                visit(node.body)
+                for handler in node.handlers:
+                    visit(handler.body)
+                visit(node.orelse)
+                visit(node.finalbody)
+            elif isinstance(node, ast.With):
+                visit(node.body)
+
+    visit(tree.body)
+    return list(imports.items())
+
+
+def find_python(file_path):
+    """返回文件所属项目的解释器：向上查找 .venv / venv，其次 VIRTUAL_ENV，最后使用当前解释器"""
+    bin_dir, exe = ("Scripts", "python.exe") if os.name == "nt" else ("bin", "python")
+    directory = os.path.dirname(os.path.abspath(file_path))
+    while True:
+        for venv in (".venv", "venv"):
+            candidate = os.path.join(directory, venv, bin_dir, exe)
+            if os.access(candidate, os.X_OK):
+                return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    if os.environ.get("VIRTUAL_ENV"):
+        candidate = os.path.join(os.environ["VIRTUAL_ENV"], bin_dir, exe)
+        if os.access(candidate, os.X_OK):
+            return candidate
+    return sys.executable
+
+
+def locate_modules(python, names, sandbox, timeout):
+    """返回 {模块: 模块文件路径}，不包含找不到或不是普通文件（内置模块等）的模块；查找失败时返回None"""
+    try:
+        result = subprocess.run(
+            [python, "-c", LOCATE_SCRIPT, *names],
+            cwd=sandbox,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        origins = json.loads(result.stdout)
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+    return {
+        name: origin
+        for name, origin in origins.items()
+        if isinstance(origin, str) and os.path.isfile(origin)
+    }
+
+
+def measure_import(python, name, sandbox, timeout):
+    """在子进程中用 -X importtime 测量导入模块的累计耗时（毫秒）
+
+    子进程在空的临时目录中运行，项目中的同名文件不会被导入。超时返回 (超时时间, True)，失败返回None。
+    """
+    try:
+        result = subprocess.run(
+            [python, "-X", "importtime", "-c", f"import {name}"],
+            cwd=sandbox,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return round(timeout * 1000), True
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    # 格式: import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == name:
+            try:
+                return round(int(parts[1]) / 1000), False
+            except ValueError:
+                return None
+    return None
+
+
+def import_costs(file_path, names):
+    """返回 {模块: (耗时毫秒, 是否超时)}
+
+    结果按解释器和模块缓存，模块文件（如包的 __init__.py）签名不变时直接复用，
+    升级或重装包后重新测量；导入失败的模块同样按签名缓存，不在每次编辑时重复测量。
+    超出 IMPORTTIME_BUDGET 时未测量的模块留到下次。
+    """
+    python = find_python(file_path)
+    cache = load_cache("file-stats-imports")
+    entries = cache.setdefault(python, {})
+    now = time.time()
+    costs = {}
+    pending = []
+    for name in names:
+        entry = entries.get(name)
+        if entry and entry["origin"] is None and now - entry["checked"] < MISSING_TTL:
+            continue
+        if (
+            entry
+            and entry["origin"]
+            and file_signature([entry["origin"]]) == entry["signature"]
+        ):
+            if not entry.get("failed"):
+                costs[name] = (entry["ms"], entry["timeout"])
+        elif re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            pending.append(name)
+    if not pending:
+        return costs
+
+    deadline = time.monotonic() + IMPORTTIME_BUDGET
+    with tempfile.TemporaryDirectory(prefix="file-stats-") as sandbox:
+        origins = locate_modules(python, pending, sandbox, IMPORTTIME_BUDGET)
+        if origins is None:
+            return costs
+        for name in pending:
+            if name not in origins:
+                entries[name] = {"origin": None, "checked": now}
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            measured = measure_import(python, name, sandbox, remaining)
+            signature = file_signature([origins[name]])
+            if not measured:
+                # 导入失败（如缺少依赖）时记下失败，模块文件变化后再重新测量
+                entries[name] = {
+                    "origin": origins[name],
+                    "signature": signature,
+                    "failed": True,
+                }
+                continue
+            # 剩余预算不足一半时的超时不代表模块本身慢，下次重新测量
+            if measured[1] and remaining < IMPORTTIME_BUDGET / 2:
+                continue
+            costs[name] = measured
+            entries[name] = {
+                "origin": origins[name],
+                "signature": signature,
+                "ms": measured[0],
+                "timeout": measured[1],
+            }
+    save_cache("file-stats-imports", cache)
+    return costs
+
+
+def analyze_imports(tree, file_path):
+    """返回 (模块级导入 [(包名, 行号)], 建议延迟的导入 [(包名, 行号, 耗时描述)])"""
+    imports = top_level_imports(tree)
+    heavy = heavy_modules()
+    costs = {}
+    if os.environ.get("CLAUDE_FILE_STATS_IMPORTTIME") == "1":
+        stdlib = getattr(sys, "stdlib_module_names", ())
+        third_party = [name for name, _ in imports if name not in stdlib]
+        costs = import_costs(file_path, third_party)
+
+    slow = []
+    for name, lineno in imports:
+        cost = costs.get(name)
+        if name not in heavy and not (cost and cost[0] >= IMPORT_SLOW_MS):
+            continue
+        if cost:
+            slow.append((name, lineno, f"{'≥' if cost[1] else ''}{cost[0]}ms"))
+        else:
+            slow.append((name, lineno, None))
+    return imports, slow
+
+
 def analyze_file(file_path):
     """分析文件并返回统计信息"""
     try:
@@ -65,6 +327,23 @@ def analyze_file(file_path):
             "classes": len(re.findall(r"^\s*class\s+\w+", content, re.MULTILINE)),
         }
 
+        if file_ext == ".py":
+            try:
+                tree = ast.parse(content)
+            except (SyntaxError, ValueError):
+                tree = None
+            if tree:
+                # 用语法树统计，不会计入字符串和注释中的 def / class
+                nodes = list(ast.walk(tree))
+                stats["functions"] = sum(
+                    isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    for node in nodes
+                )
+                stats["classes"] = sum(isinstance(node, ast.ClassDef) for node in nodes)
+                stats["imports"], stats["slow_imports"] = analyze_imports(
+                    tree, file_path
+                )
+
         return stats
     except Exception:
         return None
@@ -74,16 +353,15 @@ def main():
     """主函数"""
     try:
         # 从stdin读取tool use信息
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Write和Edit工具
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool not in ["Write", "Edit", "MultiEdit"]:
             sys.exit(0)
 
         # 获取文件路径
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         file_path = arguments.get("file_path")
 
         if not file_path:
@@ -101,6 +379,18 @@ def main():
                 message += f"   函数数: {stats['functions']}\n"
             if stats["classes"] > 0:
                 message += f"   类数: {stats['classes']}\n"
+            if stats.get("imports"):
+                names = [name for name, _ in stats["imports"]]
+                listed = ", ".join(names[:MAX_LISTED_IMPORTS])
+                if len(names) > MAX_LISTED_IMPORTS:
+                    listed += f" 等 {len(names)} 个"
+                message += f"   模块级导入: {listed}\n"
+            if stats.get("slow_imports"):
+                items = [
+                    f"{name}（第{lineno}行{'，' + cost if cost else ''}）"
+                    for name, lineno, cost in stats["slow_imports"]
+                ]
+                message += f"   ⚡ 导入开销大，可延迟到使用它的函数内导入以加快启动: {', '.join(items)}\n"
 
             print(message)
 
@@ -113,4 +403,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "file-stats")
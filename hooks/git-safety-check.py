@@ -2,11 +2,1141 @@
 """
 Git Safety Check Hook - Git操作安全检查
 防止误操作敏感分支，检查敏感文件
+
+git add / git commit -a 执行前，结合 .git/index 和遵循 .gitignore 的目录遍历推算将要暂存的文件，
+其中包含 .env、私钥、terraform.tfstate 等敏感文件时阻止。目录遍历结果按目录mtime增量缓存。
+
+大文件检查：git add 将要暂存的大文件、git push 将要传输的新对象（直接读取对象库估算）超过阈值时
+警告或阻止，并建议使用Git LFS；由Git LFS管理的文件不计入。阈值可在仓库的 .git/config 中设置:
+  [claude-hooks]
+      largeFileWarnMb = 5     单个文件（默认5 / 50）
+      largeFileBlockMb = 50
+      pushWarnMb = 100        一次推送的总大小（默认100 / 1000）
+      pushBlockMb = 1000
 """
 
 import sys
 import json
 import re
+import os
+import shlex
+import struct
+import fnmatch
+import hashlib
+import time
+import zlib
+
+from hook_utils import (
+    MB,
+    block,
+    budget_remaining,
+    fail_open,
+    file_signature,
+    format_size,
+    list_directory,
+    load_cache,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+    walk_directories,
+)
+
+
+# 默认的敏感路径（glob）：不含 / 的模式匹配文件名，含 / 的模式匹配路径结尾
+# 可通过环境变量 CLAUDE_GIT_SENSITIVE_PATHS 追加（逗号分隔）
+SENSITIVE_PATTERNS = [
+    ".env",
+    ".env.*",
+    "*.pem",
+    "*.key",
+    "*.p12",
+    "*.pfx",
+    "*.jks",
+    "*.keystore",
+    "*.kdbx",
+    "id_rsa",
+    "id_dsa",
+    "id_ecdsa",
+    "id_ed25519",
+    "*.tfstate",
+    "*.tfstate.backup",
+    "credentials.json",
+    ".netrc",
+    ".pypirc",
+    ".aws/credentials",
+]
+
+# 例外（glob），可通过环境变量 CLAUDE_GIT_SENSITIVE_ALLOW 追加
+SENSITIVE_ALLOW_PATTERNS = ["*.example", "*.sample", "*.template", "*.dist"]
+
+# 阻止信息中最多列出的文件数
+MAX_LISTED_PATHS = 10
+
+# 大小阈值（MB）: 名称 -> (git config中 [claude-hooks] 的键, 环境变量, 默认值)，0表示不检查
+# 优先级: 仓库 .git/config > ~/.gitconfig > 环境变量 > 默认值
+SIZE_LIMITS = {
+    "file_warn": ("largefilewarnmb", "CLAUDE_GIT_LARGE_FILE_WARN_MB", 5),
+    "file_block": ("largefileblockmb", "CLAUDE_GIT_LARGE_FILE_BLOCK_MB", 50),
+    "push_warn": ("pushwarnmb", "CLAUDE_GIT_PUSH_WARN_MB", 100),
+    "push_block": ("pushblockmb", "CLAUDE_GIT_PUSH_BLOCK_MB", 1000),
+}
+
+# 目录遍历和index缓存中记录的大文件下限，单个文件的阈值低于该值时按该值处理
+LARGE_FILE_FLOOR = 1 * MB
+
+# 推算暂存文件时遍历工作区的时间预算（秒），超出后只检查已遍历的部分，已遍历的目录写入缓存，下次继续
+STAGING_SCAN_BUDGET = 1.0
+
+# 估算推送大小时读取对象库的时间预算（秒）和最多遍历的提交数，超出后结果作为下限
+PUSH_SCAN_BUDGET = 0.5
+MAX_PUSH_COMMITS = 1000
+
+
+def env_patterns(name, defaults):
+    extra = os.environ.get(name, "")
+    return defaults + [p.strip() for p in extra.split(",") if p.strip()]
+
+
+def glob_to_regex(pattern):
+    """把glob/gitignore模式转换为正则: * 和 ? 不匹配 /，** 匹配任意层目录"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            out.append("[" + content.replace("\\", "\\\\") + "]")
+            i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def compile_path_matcher(patterns):
+    """把一组glob合并编译成单个正则（对仓库相对路径做fullmatch），没有模式时返回None"""
+    parts = [glob_to_regex(p.strip("/")) for p in patterns if p.strip("/")]
+    if not parts:
+        return None
+    return re.compile(r"(?:.*/)?(?:" + "|".join(parts) + ")")
+
+
+SENSITIVE_MATCHER = compile_path_matcher(
+    env_patterns("CLAUDE_GIT_SENSITIVE_PATHS", SENSITIVE_PATTERNS)
+)
+SENSITIVE_ALLOW_MATCHER = compile_path_matcher(
+    env_patterns("CLAUDE_GIT_SENSITIVE_ALLOW", SENSITIVE_ALLOW_PATTERNS)
+)
+
+
+def is_sensitive(path):
+    if not SENSITIVE_MATCHER.fullmatch(path):
+        return False
+    return not (SENSITIVE_ALLOW_MATCHER and SENSITIVE_ALLOW_MATCHER.fullmatch(path))
+
+
+def find_repo(start):
+    """向上查找仓库，返回 (工作区根目录, git目录)，找不到时返回 (None, None)"""
+    path = os.path.abspath(start)
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            return path, dot_git
+        if os.path.isfile(dot_git):
+            # worktree 和子模块的 .git 是指向真实git目录的文件
+            try:
+                with open(dot_git, encoding="utf-8") as f:
+                    content = f.read().strip()
+            except OSError:
+                return None, None
+            if content.startswith("gitdir:"):
+                return path, os.path.join(path, content[len("gitdir:"):].strip())
+            return None, None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+
+
+def read_git_config(path):
+    """解析git配置文件，返回 {"section" 或 "section.subsection": {key: value}}，键名小写"""
+    config = {}
+    section = None
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return config
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+        header = re.match(r'^\[\s*([A-Za-z0-9.-]+)(?:\s+"(.*)")?\s*\]', line)
+        if header:
+            section = header.group(1).lower()
+            if header.group(2) is not None:
+                section += "." + header.group(2)
+            config.setdefault(section, {})
+            continue
+        if section is None:
+            continue
+        key, _, value = line.partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        config[section][key.strip().lower()] = value if _ else "true"
+    return config
+
+
+def common_dir(git_dir):
+    """返回存放refs、objects和config的公共git目录（worktree的git目录通过commondir指向它）"""
+    try:
+        with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def size_limits(git_dir):
+    """返回大小阈值（字节），见 SIZE_LIMITS"""
+    config = {}
+    for config_path in (
+        os.path.expanduser("~/.gitconfig"),
+        os.path.join(common_dir(git_dir), "config"),
+    ):
+        config.update(read_git_config(config_path).get("claude-hooks", {}))
+    limits = {}
+    for name, (key, env_name, default) in SIZE_LIMITS.items():
+        try:
+            limits[name] = float(config.get(key) or os.environ.get(env_name) or default) * MB
+        except ValueError:
+            limits[name] = default * MB
+    return limits
+
+
+def size_level(size, warn, block_at):
+    """按阈值返回 "block" / "warn"，未超过阈值时返回None"""
+    if block_at > 0 and size >= block_at:
+        return "block"
+    if warn > 0 and size >= warn:
+        return "warn"
+    return None
+
+
+def parse_lfs_attributes(path, base):
+    """解析.gitattributes，返回设置了filter属性的 [(正则, 是否由LFS管理)]"""
+    rules = []
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        parts = line.split()
+        if not parts or parts[0].startswith("#"):
+            continue
+        lfs = None
+        for attr in parts[1:]:
+            if attr == "filter=lfs":
+                lfs = True
+            elif attr in ("-filter", "!filter") or attr.startswith("filter="):
+                lfs = False
+        if lfs is not None:
+            rules.append((compile_relative_pattern(parts[0], base), lfs))
+    return rules
+
+
+def is_lfs_tracked(root, git_dir, rel, memo):
+    """判断路径是否由Git LFS管理（.gitattributes 中 filter=lfs），memo缓存已解析的文件"""
+    files = []
+    parts = rel.split("/")
+    for depth in range(len(parts)):
+        ancestor = "/".join(parts[:depth])
+        files.append((os.path.join(root, ancestor, ".gitattributes"), ancestor))
+    # info/attributes 的优先级最高
+    files.append((os.path.join(common_dir(git_dir), "info", "attributes"), ""))
+
+    tracked = False
+    for path, base in files:
+        if path not in memo:
+            memo[path] = parse_lfs_attributes(path, base)
+        for regex, lfs in memo[path]:
+            if regex.fullmatch(rel):
+                tracked = lfs
+    return tracked
+
+
+def global_exclude_files(git_dir):
+    """返回仓库级和用户级的忽略规则文件（info/exclude 和 core.excludesFile）"""
+    files = [os.path.join(git_dir, "info", "exclude")]
+    excludes = None
+    for config_path in (
+        os.path.expanduser("~/.gitconfig"),
+        os.path.join(git_dir, "config"),
+    ):
+        excludes = read_git_config(config_path).get("core", {}).get("excludesfile", excludes)
+    if excludes:
+        files.append(os.path.expanduser(excludes))
+    else:
+        config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+        files.append(os.path.join(config_home, "git", "ignore"))
+    return files
+
+
+def parse_ignore_file(path, base):
+    """解析.gitignore格式的文件，返回 [(正则, 是否取反, 是否只匹配目录)]
+
+    base为该文件所在目录（仓库相对路径），正则匹配仓库相对路径。
+    """
+    rules = []
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        rules.append((compile_relative_pattern(line, base), negate, dir_only))
+    return rules
+
+
+def compile_relative_pattern(pattern, base):
+    """编译.gitignore/.gitattributes中的模式，base为规则文件所在目录（仓库相对路径）
+
+    中间或开头带 / 的模式相对于base，否则匹配base下任意层级的文件名。
+    """
+    prefix = re.escape(base + "/") if base else ""
+    regex = glob_to_regex(pattern.lstrip("/"))
+    if "/" not in pattern:
+        regex = "(?:.*/)?" + regex
+    return re.compile(prefix + regex)
+
+
+def is_ignored(rules, path, is_dir):
+    """按gitignore语义判断路径是否被忽略（最后匹配的规则生效）"""
+    for regex, negate, dir_only in reversed(rules):
+        if dir_only and not is_dir:
+            continue
+        if regex.fullmatch(path):
+            return not negate
+    return False
+
+
+class IgnoreRules:
+    """按需加载的忽略规则链，只有目录需要重新扫描时才解析对应的.gitignore"""
+
+    def __init__(self, root, git_dir):
+        self.root = root
+        self.base_files = global_exclude_files(git_dir)
+        self.memo = {}
+
+    def base_key(self):
+        sig = file_signature(self.base_files)
+        return hashlib.sha1(json.dumps(sig).encode("utf-8")).hexdigest()[:16]
+
+    def rules(self, chain):
+        """chain为从根目录开始、包含.gitignore的目录元组"""
+        if chain not in self.memo:
+            if chain:
+                rules = self.rules(chain[:-1]) + parse_ignore_file(
+                    os.path.join(self.root, chain[-1], ".gitignore"), chain[-1]
+                )
+            else:
+                rules = []
+                for path in self.base_files:
+                    rules += parse_ignore_file(path, "")
+            self.memo[chain] = rules
+        return self.memo[chain]
+
+
+def classify_entries(root, rel, entries, rules, use_ignore):
+    """返回 (未被忽略的子目录, 未被忽略的敏感文件, 未被忽略的大文件)，rules为返回规则列表的函数"""
+    subdirs = []
+    sensitive = []
+    large = []
+    for name, is_dir, size in entries:
+        path = f"{rel}/{name}" if rel else name
+        if is_dir:
+            if name == ".git" or os.path.exists(os.path.join(root, path, ".git")):
+                # 跳过git目录以及子模块/嵌套仓库
+                continue
+            if use_ignore and is_ignored(rules(), path, True):
+                continue
+            subdirs.append(name)
+            continue
+        flagged = is_sensitive(path)
+        if not flagged and size < LARGE_FILE_FLOOR:
+            continue
+        if use_ignore and is_ignored(rules(), path, False):
+            continue
+        if flagged:
+            sensitive.append(name)
+        if size >= LARGE_FILE_FLOOR:
+            large.append(name)
+    return subdirs, sensitive, large
+
+
+def walk_worktree(root, start, ignore_rules, dirs_cache, use_ignore, deadline):
+    """增量遍历start（仓库相对路径）下的目录
+
+    返回 (未被忽略的敏感文件, 未被忽略的大文件, 是否遍历完整, 缓存是否有变化)。
+
+    dirs_cache: {目录: [mtime_ns, 规则键, 子目录, 敏感文件, 是否有.gitignore, 大文件]}。
+    目录中增删文件会改变目录自身的mtime，规则键由根目录到该目录的所有忽略规则文件的签名计算；
+    两者都没变时直接复用缓存，每个目录只需要stat一次，不需要重新列出和匹配。
+    原地改写文件不会改变目录mtime，因此大文件只记录路径，大小由调用方重新stat；
+    原本较小、原地增长到超过 LARGE_FILE_FLOOR 的文件要等目录变化后才会被发现。
+    超过deadline（单调时钟）后停止遍历，已列出的目录留在缓存中，下次从缓存继续。
+    """
+    # 起始目录之上各级目录的.gitignore
+    chain = ()
+    key = ignore_rules.base_key() if use_ignore else "force"
+    parts = start.split("/") if start else []
+    for depth in range(len(parts)):
+        ancestor = "/".join(parts[:depth])
+        gitignore = os.path.join(root, ancestor, ".gitignore")
+        if use_ignore and os.path.isfile(gitignore):
+            chain += (ancestor,)
+            key = child_key(key, gitignore)
+
+    found = []
+    found_large = []
+    changed = False
+
+    def visit(rel, state):
+        nonlocal changed
+        chain, key = state
+        path = os.path.join(root, rel) if rel else root
+        mtime = os.stat(path).st_mtime_ns
+        cached = dirs_cache.get(rel)
+        entries = None
+        if cached and len(cached) == 6 and cached[0] == mtime:
+            has_ignore = cached[4]
+        else:
+            entries = list_directory(path)
+            has_ignore = any(name == ".gitignore" and not is_dir for name, is_dir, _ in entries)
+
+        if use_ignore and has_ignore:
+            chain = chain + (rel,)
+            key = child_key(key, os.path.join(path, ".gitignore"))
+
+        if entries is None and cached[1] != key:
+            # 目录没变但上级或自身的忽略规则变了
+            entries = list_directory(path)
+        if entries is not None:
+            subdirs, sensitive, large = classify_entries(root, rel, entries, lambda: ignore_rules.rules(chain), use_ignore)
+            cached = [mtime, key, subdirs, sensitive, has_ignore, large]
+            dirs_cache[rel] = cached
+            changed = True
+
+        prefix = f"{rel}/" if rel else ""
+        found.extend(prefix + name for name in cached[3])
+        found_large.extend(prefix + name for name in cached[5])
+        return [(prefix + name, (chain, key)) for name in cached[2]]
+
+    visited, complete = walk_directories(start, visit, deadline, (chain, key))
+    if not complete:
+        return found, found_large, False, changed
+
+    # 清理已删除目录的缓存
+    for rel in list(dirs_cache):
+        in_scope = not start or rel == start or rel.startswith(start + "/")
+        if in_scope and rel not in visited:
+            del dirs_cache[rel]
+            changed = True
+    return found, found_large, True, changed
+
+
+def child_key(parent_key, gitignore):
+    sig = file_signature([gitignore])
+    return hashlib.sha1(f"{parent_key}:{sig}".encode("utf-8")).hexdigest()[:16]
+
+
+def read_varint(data, pos):
+    """读取index v4路径压缩使用的变长整数"""
+    c = data[pos]
+    pos += 1
+    value = c & 0x7F
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7F)
+    return value, pos
+
+
+def parse_git_index(path):
+    """解析 .git/index（v2/v3/v4），返回敏感路径和大文件的 {路径: [mtime秒, mtime纳秒, 大小]}"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 12 or data[:4] != b"DIRC":
+        return None
+    version, count = struct.unpack(">II", data[4:12])
+    if version not in (2, 3, 4):
+        return None
+
+    entries = {}
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        mtime_s, mtime_ns = struct.unpack_from(">II", data, pos + 8)
+        size = struct.unpack_from(">I", data, pos + 36)[0]
+        flags = struct.unpack_from(">H", data, pos + 60)[0]
+        name_start = pos + 62
+        if version >= 3 and flags & 0x4000:
+            name_start += 2
+
+        if version == 4:
+            # 路径前缀压缩: 去掉上一个路径末尾的N个字节，再拼接本条的后缀
+            strip, name_start = read_varint(data, name_start)
+            end = data.index(b"\0", name_start)
+            name = previous[: len(previous) - strip] + data[name_start:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", name_start)
+            name = data[name_start:end]
+            # 条目以NUL补齐到8字节的整数倍
+            pos += (end - pos + 8) & ~7
+        previous = name
+
+        # 只保留stage 0（无冲突）的敏感路径和大文件
+        if flags & 0x3000:
+            continue
+        path_str = name.decode("utf-8", "surrogateescape")
+        if size >= LARGE_FILE_FLOOR or is_sensitive(path_str):
+            entries[path_str] = [mtime_s, mtime_ns, size]
+    return entries
+
+
+def load_index_entries(git_dir, repo_cache):
+    """读取index中的敏感路径和大文件，按index文件签名缓存"""
+    index_path = os.path.join(git_dir, "index")
+    signature = file_signature([index_path])
+    cached = repo_cache.get("index")
+    if cached and cached.get("signature") == signature and cached.get("floor") == LARGE_FILE_FLOOR:
+        return cached["entries"]
+    try:
+        entries = parse_git_index(index_path) or {}
+    except (OSError, ValueError, struct.error, IndexError):
+        entries = {}
+    repo_cache["index"] = {"signature": signature, "floor": LARGE_FILE_FLOOR, "entries": entries}
+    return entries
+
+
+def staging_state(root, path, index_entries):
+    """返回文件会被暂存的原因（未跟踪/已修改），不会产生变更时返回None"""
+    try:
+        stat = os.stat(os.path.join(root, path))
+    except OSError:
+        return None
+    entry = index_entries.get(path)
+    if entry is None:
+        return "未跟踪"
+    if (
+        entry[0] != stat.st_mtime_ns // 10**9
+        or entry[1] != stat.st_mtime_ns % 10**9
+        or entry[2] != stat.st_size % 2**32
+    ):
+        return "已修改"
+    return None
+
+
+def split_command(command):
+    """用shlex把复合命令拆成多个片段的参数列表"""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=";&|")
+    lexer.whitespace_split = True
+    segments = [[]]
+    for token in lexer:
+        if token and set(token) <= set(";&|"):
+            segments.append([])
+        else:
+            segments[-1].append(token)
+    return [segment for segment in segments if segment]
+
+
+def iter_git_invocations(command, cwd):
+    """依次产生命令中的git调用 (工作目录, 子命令, 子命令参数)，跟踪cd、环境变量前缀和git -C"""
+    for args in split_command(command):
+        while args and re.match(r"^[A-Za-z_][A-Za-z0-9_]*=", args[0]):
+            args = args[1:]
+        if not args:
+            continue
+        if args[0] == "cd" and len(args) > 1:
+            cwd = os.path.join(cwd, os.path.expanduser(args[1]))
+            continue
+        if args[0] != "git":
+            continue
+
+        # git的全局参数
+        git_cwd = cwd
+        i = 1
+        while i < len(args) and args[i].startswith("-"):
+            if args[i] == "-C" and i + 1 < len(args):
+                git_cwd = os.path.join(git_cwd, os.path.expanduser(args[i + 1]))
+                i += 1
+            elif args[i] == "-c":
+                i += 1
+            i += 1
+        if i < len(args):
+            yield git_cwd, args[i], args[i + 1:]
+
+
+def parse_staging_commands(command, cwd):
+    """找出命令中会暂存文件的git调用，返回 [(工作目录, 模式, pathspecs, 是否强制)]
+
+    模式: "add"（新增和修改）或 "tracked"（只暂存已跟踪文件的修改，如 add -u 和 commit -a）。
+    """
+    results = []
+    for git_cwd, subcommand, rest in iter_git_invocations(command, cwd):
+        options = [arg for arg in rest if arg.startswith("-") and arg != "--"]
+        if "--" in rest:
+            split_at = rest.index("--")
+            pathspecs = [a for a in rest[:split_at] if not a.startswith("-")] + rest[split_at + 1:]
+        else:
+            pathspecs = [arg for arg in rest if not arg.startswith("-")]
+
+        if subcommand == "add":
+            short = "".join(opt[1:] for opt in options if not opt.startswith("--"))
+            if set(short) & set("npi") or {"--dry-run", "--patch", "--interactive"} & set(options):
+                continue
+            force = "f" in short or "--force" in options
+            if "u" in short or "--update" in options:
+                results.append((git_cwd, "tracked", pathspecs or [":/"], force))
+            elif "A" in short or "--all" in options:
+                results.append((git_cwd, "add", pathspecs or [":/"], force))
+            elif pathspecs:
+                results.append((git_cwd, "add", pathspecs, force))
+        elif subcommand == "commit":
+            # -m/-F/-c/-C/-t 之后的字母是参数值，如 -am 中的 a 才是选项
+            commit_all = "--all" in options or any(
+                "a" in re.split(r"[mFcCt]", opt[1:], maxsplit=1)[0]
+                for opt in options
+                if not opt.startswith("--")
+            )
+            if commit_all:
+                results.append((git_cwd, "tracked", [":/"], False))
+    return results
+
+
+def resolve_pathspec(root, cwd, pathspec):
+    """把pathspec转换为 (仓库相对路径, glob)；glob为None时表示路径本身"""
+    if pathspec == ":/":
+        return "", None
+    if pathspec.startswith(":"):
+        # 其他magic pathspec按当前目录处理
+        pathspec = "."
+    base = os.path.relpath(os.path.abspath(cwd), root)
+    base = "" if base == "." else base
+    if re.search(r"[*?\[]", pathspec):
+        return base, os.path.join(base, pathspec) if base else pathspec
+    rel = os.path.normpath(os.path.join(base, pathspec))
+    return ("" if rel == "." else rel), None
+
+
+def find_staged_files(command, cwd, deadline):
+    """返回命令将要暂存的 (敏感文件 [(路径, 原因)], 大文件 [(路径, 大小, 级别)], 是否检查完整)
+
+    由Git LFS管理的大文件不计入。遍历工作区超过deadline时只返回已遍历部分的结果。
+    """
+    sensitive = []
+    large = []
+    complete = True
+    for git_cwd, mode, pathspecs, force in parse_staging_commands(command, cwd):
+        root, git_dir = find_repo(git_cwd)
+        if not root:
+            continue
+        cache_name = "git-safety-" + hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+        repo_cache = load_cache(cache_name)
+        cached_index = repo_cache.get("index")
+        index_entries = load_index_entries(git_dir, repo_cache)
+        changed = repo_cache.get("index") is not cached_index
+
+        candidates = set()
+        large_candidates = set()
+        for pathspec in pathspecs:
+            rel, glob = resolve_pathspec(root, git_cwd, pathspec)
+            if rel.startswith(".."):
+                continue
+            full = os.path.join(root, rel)
+            if mode == "tracked":
+                in_scope = [
+                    path
+                    for path in index_entries
+                    if not rel or path == rel or path.startswith(rel + "/")
+                ]
+                candidates.update(path for path in in_scope if is_sensitive(path))
+                large_candidates.update(in_scope)
+            elif glob is None and not os.path.isdir(full):
+                # 显式指定的文件：被忽略的文件需要 -f 才会被添加
+                flagged = is_sensitive(rel)
+                try:
+                    is_large = os.path.getsize(full) >= LARGE_FILE_FLOOR
+                except OSError:
+                    is_large = False
+                if (flagged or is_large) and (
+                    force or rel in index_entries or not path_ignored(root, git_dir, rel)
+                ):
+                    if flagged:
+                        candidates.add(rel)
+                    if is_large:
+                        large_candidates.add(rel)
+            else:
+                dirs_key = "dirs_force" if force else "dirs"
+                dirs_cache = repo_cache.setdefault(dirs_key, {})
+                found, found_large, walked, walk_changed = walk_worktree(
+                    root, rel, IgnoreRules(root, git_dir), dirs_cache, not force, deadline
+                )
+                complete = complete and walked
+                changed = changed or walk_changed
+                if glob:
+                    found = [path for path in found if fnmatch.fnmatch(path, glob)]
+                    found_large = [path for path in found_large if fnmatch.fnmatch(path, glob)]
+                candidates.update(found)
+                large_candidates.update(found_large)
+
+        for path in sorted(candidates):
+            reason = staging_state(root, path, index_entries)
+            if reason:
+                sensitive.append((os.path.join(root, path), reason))
+
+        if large_candidates:
+            limits = size_limits(git_dir)
+            attributes = {}
+            for path in sorted(large_candidates):
+                # 目录缓存只记录路径，大小总是重新stat
+                try:
+                    size = os.path.getsize(os.path.join(root, path))
+                except OSError:
+                    continue
+                level = size_level(size, limits["file_warn"], limits["file_block"])
+                if (
+                    level
+                    and staging_state(root, path, index_entries)
+                    and not is_lfs_tracked(root, git_dir, path, attributes)
+                ):
+                    large.append((os.path.join(root, path), size, level))
+
+        if changed:
+            save_cache(cache_name, repo_cache)
+    return sensitive, large, complete
+
+
+def path_ignored(root, git_dir, rel):
+    """判断单个路径（或其任一上级目录）是否被忽略"""
+    ignore_rules = IgnoreRules(root, git_dir)
+    parts = rel.split("/")
+    chain = ()
+    for depth in range(len(parts)):
+        ancestor = "/".join(parts[:depth])
+        if os.path.isfile(os.path.join(root, ancestor, ".gitignore")):
+            chain += (ancestor,)
+        path = "/".join(parts[: depth + 1])
+        if is_ignored(ignore_rules.rules(chain), path, depth < len(parts) - 1):
+            return True
+    return False
+
+
+def lfs_patterns(paths):
+    """按扩展名生成Git LFS的模式，没有扩展名时使用文件名"""
+    patterns = set()
+    for path in paths:
+        ext = os.path.splitext(path)[1]
+        patterns.add(f"*{ext}" if ext else os.path.basename(path))
+    return sorted(patterns)[:MAX_LISTED_PATHS]
+
+
+def scan_deadline(budget):
+    """扫描的截止时间（单调时钟）: 不超过budget秒，也不超过hook剩余延迟预算的一半"""
+    return time.monotonic() + min(budget, budget_remaining(budget) / 2)
+
+
+def check_staging(command):
+    """git add / git commit -a 将要暂存敏感文件时阻止，暂存大文件时按阈值警告或阻止"""
+    staged, large, complete = find_staged_files(
+        command, os.getcwd(), scan_deadline(STAGING_SCAN_BUDGET)
+    )
+    if not complete:
+        print("💡 工作区较大，未能在时间预算内检查完将要暂存的文件；已检查的目录已缓存，下次会继续检查")
+    if staged:
+        lines = [f"   - {os.path.relpath(path)}（{reason}）" for path, reason in staged[:MAX_LISTED_PATHS]]
+        if len(staged) > MAX_LISTED_PATHS:
+            lines.append(f"   - ... 共 {len(staged)} 个文件")
+        error_msg = "🚨 以下敏感文件将被暂存，已阻止:\n" + "\n".join(lines)
+        error_msg += "\n💡 请将这些文件加入 .gitignore，已跟踪的文件可用 git rm --cached <file> 移出版本控制"
+        error_msg += "\n   确认需要提交时，可通过环境变量 CLAUDE_GIT_SENSITIVE_ALLOW 添加例外（逗号分隔的glob）"
+        block("git-safety-check", error_msg)
+
+    if not large:
+        return
+    blocked = any(level == "block" for _, _, level in large)
+    lines = [f"   - {os.path.relpath(path)}（{format_size(size)}）" for path, size, _ in large[:MAX_LISTED_PATHS]]
+    if len(large) > MAX_LISTED_PATHS:
+        lines.append(f"   - ... 共 {len(large)} 个文件")
+    message = ("🚨 以下大文件将被暂存，已阻止:\n" if blocked else "⚠️ 以下大文件将被暂存:\n") + "\n".join(lines)
+    patterns = " ".join(f"'{pattern}'" for pattern in lfs_patterns(path for path, _, _ in large))
+    message += (
+        f"\n💡 大文件会让之后的每次clone和CI检出变慢，建议使用 Git LFS: git lfs track {patterns}"
+        "\n   构建产物、数据集、core dump等请加入 .gitignore"
+        "\n   阈值可按仓库调整: git config claude-hooks.largeFileWarnMb / claude-hooks.largeFileBlockMb"
+    )
+    if blocked:
+        block("git-safety-check", message)
+    print(message)
+    record_metric("git-safety-check", "warn")
+
+
+def parse_push_commands(command, cwd):
+    """找出命令中的git push，返回 [(工作目录, 远程仓库, refspecs, 是否推送全部分支)]
+
+    --dry-run、--delete、--mirror、--tags 不会推送新的分支提交，跳过。
+    """
+    results = []
+    for git_cwd, subcommand, rest in iter_git_invocations(command, cwd):
+        if subcommand != "push":
+            continue
+        positional = []
+        all_branches = False
+        skip = False
+        i = 0
+        while i < len(rest):
+            arg = rest[i]
+            if arg in ("-o", "--push-option", "--repo", "--receive-pack", "--exec"):
+                i += 1
+            elif arg in ("--dry-run", "--delete", "--mirror", "--tags"):
+                skip = True
+            elif arg in ("--all", "--branches"):
+                all_branches = True
+            elif arg.startswith("-") and not arg.startswith("--"):
+                skip = skip or bool(set(arg[1:]) & set("nd"))
+            elif not arg.startswith("-"):
+                positional.append(arg)
+            i += 1
+        if not skip:
+            remote = positional[0] if positional else None
+            results.append((git_cwd, remote, positional[1:], all_branches))
+    return results
+
+
+def packed_refs(git_dir):
+    """读取packed-refs，返回 {引用: 对象名}"""
+    refs = {}
+    try:
+        with open(os.path.join(common_dir(git_dir), "packed-refs"), encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("#", "^")):
+                    continue
+                parts = line.split()
+                if len(parts) == 2:
+                    refs[parts[1]] = parts[0]
+    except OSError:
+        pass
+    return refs
+
+
+def read_ref(git_dir, name, depth=0):
+    """解析引用（HEAD或refs/...），返回对象名，找不到时返回None"""
+    # HEAD是每个worktree独立的，其他引用在公共git目录中
+    base = git_dir if name == "HEAD" else common_dir(git_dir)
+    try:
+        with open(os.path.join(base, name), encoding="utf-8") as f:
+            value = f.read().strip()
+    except OSError:
+        value = packed_refs(git_dir).get(name)
+    if value and value.startswith("ref:"):
+        return read_ref(git_dir, value[4:].strip(), depth + 1) if depth < 5 else None
+    return value or None
+
+
+def current_branch(git_dir):
+    try:
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    if head.startswith("ref: refs/heads/"):
+        return head[len("ref: refs/heads/"):]
+    return None
+
+
+def local_branches(git_dir):
+    heads_dir = os.path.join(common_dir(git_dir), "refs", "heads")
+    branches = {ref[len("refs/heads/"):] for ref in packed_refs(git_dir) if ref.startswith("refs/heads/")}
+    for dirpath, _, filenames in os.walk(heads_dir):
+        for filename in filenames:
+            branches.add(os.path.relpath(os.path.join(dirpath, filename), heads_dir).replace(os.sep, "/"))
+    return sorted(branches)
+
+
+def remote_refs(git_dir, remote):
+    """返回远程跟踪分支 refs/remotes/<remote>/ 下所有引用指向的提交"""
+    prefix = f"refs/remotes/{remote}/"
+    refs = {ref for ref in packed_refs(git_dir) if ref.startswith(prefix)}
+    remote_dir = os.path.join(common_dir(git_dir), "refs", "remotes", remote)
+    for dirpath, _, filenames in os.walk(remote_dir):
+        for filename in filenames:
+            refs.add(prefix + os.path.relpath(os.path.join(dirpath, filename), remote_dir).replace(os.sep, "/"))
+    return {oid for oid in (read_ref(git_dir, ref) for ref in refs) if oid}
+
+
+def push_targets(git_dir, remote, refspecs, all_branches):
+    """返回 (远程仓库, [(本地分支, 本地提交, 远程跟踪分支的提交或None)])"""
+    config = read_git_config(os.path.join(common_dir(git_dir), "config"))
+    branch = current_branch(git_dir)
+    upstream = config.get(f"branch.{branch}", {}) if branch else {}
+    remote = remote or upstream.get("remote") or "origin"
+
+    pairs = []
+    if all_branches:
+        pairs = [(name, name) for name in local_branches(git_dir)]
+    elif refspecs:
+        for refspec in refspecs:
+            src, _, dst = refspec.lstrip("+").partition(":")
+            if not src:
+                # :branch 删除远程分支
+                continue
+            if src == "HEAD" and branch:
+                src = branch
+            pairs.append((src, dst or src))
+    elif branch:
+        merge = upstream.get("merge") if upstream.get("remote") == remote else None
+        pairs.append((branch, merge or branch))
+
+    targets = []
+    for src, dst in pairs:
+        local = read_ref(git_dir, src if src == "HEAD" or src.startswith("refs/") else f"refs/heads/{src}")
+        if not local:
+            continue
+        dst = dst[len("refs/heads/"):] if dst.startswith("refs/heads/") else dst
+        base = read_ref(git_dir, f"refs/remotes/{remote}/{dst}") or read_ref(
+            git_dir, f"refs/remotes/{remote}/HEAD"
+        )
+        targets.append((src, local, base))
+    return remote, targets
+
+
+def read_loose_object(objects_dir, oid, header_only=False):
+    """读取松散对象，返回 (类型, 大小, 内容, 压缩后大小)，不是松散对象时返回None
+
+    header_only为True时只解压对象头（如 blob 12345），内容为None。
+    """
+    try:
+        with open(os.path.join(objects_dir, oid[:2], oid[2:]), "rb") as f:
+            compressed_size = os.fstat(f.fileno()).st_size
+            if header_only:
+                data = zlib.decompressobj().decompress(f.read(512), 64)
+            else:
+                data = zlib.decompress(f.read())
+    except (OSError, zlib.error):
+        return None
+    header, _, body = data.partition(b"\0")
+    obj_type, _, size = header.partition(b" ")
+    try:
+        return obj_type.decode("ascii"), int(size), None if header_only else body, compressed_size
+    except ValueError:
+        return None
+
+
+def walk_loose_trees(objects_dir, roots, known, hash_len, deadline, large=None):
+    """遍历树对象中的松散对象，返回 (压缩后总字节数, 是否在时间预算内完成)
+
+    roots为 [(树对象名, 路径前缀)]；已打包或已在known中的对象跳过。
+    large不为None时，把不小于 LARGE_FILE_FLOOR 的文件以 (路径, 大小) 追加进去。
+    """
+    total = 0
+    stack = list(roots)
+    while stack:
+        if time.monotonic() > deadline:
+            return total, False
+        tree_oid, prefix = stack.pop()
+        if tree_oid in known:
+            continue
+        known.add(tree_oid)
+        tree = read_loose_object(objects_dir, tree_oid)
+        if not tree or tree[0] != "tree":
+            continue
+        total += tree[3]
+        body = tree[2]
+        pos = 0
+        while pos < len(body):
+            space = body.index(b" ", pos)
+            nul = body.index(b"\0", space)
+            mode = body[pos:space]
+            name = body[space + 1:nul].decode("utf-8", "surrogateescape")
+            oid = body[nul + 1:nul + 1 + hash_len].hex()
+            pos = nul + 1 + hash_len
+            if mode == b"40000":
+                stack.append((oid, f"{prefix}{name}/"))
+            elif mode != b"160000" and oid not in known:
+                # 160000是子模块，指向其他仓库的提交
+                known.add(oid)
+                blob = read_loose_object(objects_dir, oid, header_only=True)
+                if blob:
+                    total += blob[3]
+                    if large is not None and blob[1] >= LARGE_FILE_FLOOR:
+                        large.append((prefix + name, blob[1]))
+    return total, True
+
+
+def commit_fields(body):
+    """返回提交对象的 (树, [父提交])"""
+    tree = None
+    parents = []
+    for line in body.split(b"\n"):
+        if not line:
+            break
+        key, _, value = line.partition(b" ")
+        if key == b"tree":
+            tree = value.decode("ascii")
+        elif key == b"parent":
+            parents.append(value.decode("ascii"))
+    return tree, parents
+
+
+def estimate_push(git_dir, tip, base, pushed):
+    """估算推送 base..tip 要传输的数据，返回 [压缩后总字节数, 大文件 [(路径, 大小)], 是否完整]
+
+    直接读取对象库：从tip沿父提交遍历松散的提交对象，直到远程跟踪分支的提交，
+    统计新提交的树中的松散对象。本地新对象在gc前一直是松散对象，已打包的对象视为已推送过，
+    因此gc之后的估算偏小。pushed为各远程跟踪分支指向的提交，遍历到这些提交时停止，
+    它们树中的松散对象（刚推送或小规模fetch解包出的对象）事先标记为已有。
+    """
+    objects_dir = os.path.join(common_dir(git_dir), "objects")
+    config = read_git_config(os.path.join(common_dir(git_dir), "config"))
+    hash_len = 32 if config.get("extensions", {}).get("objectformat") == "sha256" else 20
+    deadline = scan_deadline(PUSH_SCAN_BUDGET)
+
+    shared = set(pushed)
+    if base:
+        shared.add(base)
+    known = set(shared)
+    trees = []
+    for oid in shared:
+        commit = read_loose_object(objects_dir, oid)
+        if commit and commit[0] == "commit":
+            trees.append((commit_fields(commit[2])[0], ""))
+    complete = walk_loose_trees(objects_dir, trees, known, hash_len, deadline)[1]
+
+    total = 0
+    large = []
+    commits = 0
+    stack = [tip]
+    while stack and complete:
+        oid = stack.pop()
+        if oid in known:
+            continue
+        known.add(oid)
+        if commits >= MAX_PUSH_COMMITS:
+            complete = False
+            break
+        commit = read_loose_object(objects_dir, oid)
+        if not commit or commit[0] != "commit":
+            continue
+        commits += 1
+        tree, parents = commit_fields(commit[2])
+        stack.extend(parents)
+        size, complete = walk_loose_trees(
+            objects_dir, [(tree, "")], known, hash_len, deadline, large
+        )
+        total += commit[3] + size
+    return [total, sorted(large, key=lambda item: -item[1]), complete]
+
+
+def check_push_size(command):
+    """git push 的新对象总大小或其中的单个文件超过阈值时警告或阻止"""
+    for git_cwd, remote, refspecs, all_branches in parse_push_commands(command, os.getcwd()):
+        root, git_dir = find_repo(git_cwd)
+        if not root:
+            continue
+        remote, targets = push_targets(git_dir, remote, refspecs, all_branches)
+        if not targets:
+            continue
+        cache_name = "git-safety-" + hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+        repo_cache = load_cache(cache_name)
+        push_cache = repo_cache.get("push", {})
+        new_cache = {}
+        limits = size_limits(git_dir)
+        pushed = None
+
+        total = 0
+        large = []
+        complete = True
+        for _, tip, base in targets:
+            # 对象不可变，同一对 (tip, base) 的估算结果可以直接复用
+            key = f"{tip}:{base}"
+            result = push_cache.get(key)
+            if not result:
+                if pushed is None:
+                    pushed = remote_refs(git_dir, remote)
+                result = estimate_push(git_dir, tip, base, pushed)
+            if result[2]:
+                new_cache[key] = result
+            total += result[0]
+            large.extend((path, size) for path, size in result[1])
+            complete = complete and result[2]
+        if new_cache != push_cache:
+            repo_cache["push"] = new_cache
+            save_cache(cache_name, repo_cache)
+
+        file_levels = [size_level(size, limits["file_warn"], limits["file_block"]) for _, size in large]
+        large = [item for item, level in zip(large, file_levels) if level]
+        levels = [level for level in file_levels if level]
+        levels.append(size_level(total, limits["push_warn"], limits["push_block"]))
+        if not any(levels):
+            continue
+
+        blocked = "block" in levels
+        branches = ", ".join(src for src, _, _ in targets)
+        prefix = "" if complete else "至少 "
+        lines = [
+            f"{'🚨' if blocked else '⚠️'} 推送 {branches} 到 {remote} 需要传输{prefix}{format_size(total)}"
+            + ("，已阻止" if blocked else "")
+        ]
+        if large:
+            lines.append("   其中的大文件:")
+            lines.extend(f"   - {path}（{format_size(size)}）" for path, size in large[:MAX_LISTED_PATHS])
+            if len(large) > MAX_LISTED_PATHS:
+                lines.append(f"   - ... 共 {len(large)} 个文件")
+            patterns = ",".join(lfs_patterns(path for path, _ in large))
+            lines.append(
+                f"💡 建议改用 Git LFS: git lfs migrate import --include='{patterns}' "
+                "改写尚未推送的提交，之后用 git lfs track 管理"
+            )
+        lines.append("   阈值可按仓库调整: git config claude-hooks.pushWarnMb / claude-hooks.pushBlockMb")
+        message = "\n".join(lines)
+        if blocked:
+            block("git-safety-check", message)
+        print(message)
+        record_metric("git-safety-check", "warn")
 
 
 def check_git_command(command):
@@ -36,8 +1166,7 @@ def check_git_command(command):
             safe_in_message = True
 
         if not safe_in_message:
-            print("❌ 禁止使用 --no-verify 跳过Git Hooks验证！", file=sys.stderr)
-            sys.exit(2)
+            block("git-safety-check", "❌ 禁止使用 --no-verify 跳过Git Hooks验证！")
 
     # 受保护的分支
     protected_branches = ["main", "master", "production", "prod"]
@@ -53,13 +1182,11 @@ def check_git_command(command):
     for branch in protected_branches:
         if f"git push origin :{branch}" in command:
             error_msg = f"❌ 阻止删除受保护分支 '{branch}'"
-            print(error_msg, file=sys.stderr)
-            sys.exit(2)  # Exit code 2 = blocking error
+            block("git-safety-check", error_msg)
 
         if re.search(rf"git\s+branch\s+-[dD].*{branch}", command):
             error_msg = f"❌ 阻止删除受保护分支 '{branch}'"
-            print(error_msg, file=sys.stderr)
-            sys.exit(2)  # Exit code 2 = blocking error
+            block("git-safety-check", error_msg)
 
     # 只记录日志，不阻止（返回None表示继续执行）
     return None
@@ -67,8 +1194,7 @@ def check_git_command(command):
 
 def main():
     """主函数"""
-    tool_use_json = sys.stdin.read()
-    tool_use = json.loads(tool_use_json)
+    tool_use = read_payload()
 
     if tool_use.get("tool_name") != "Bash":
         sys.exit(0)
@@ -78,10 +1204,18 @@ def main():
     # 只检查git命令
     if "git" in command:
         check_git_command(command)  # 会在发现问题时直接exit(2)
+        # 推算暂存文件和推送大小的耗时取决于仓库规模，超出延迟预算时放行
+        fail_open()
+        try:
+            check_staging(command)
+            check_push_size(command)
+        except Exception:
+            # 推算暂存文件或推送大小失败时不阻止操作
+            pass
 
     # 如果没有问题，静默退出
     sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "git-safety-check", fail_closed=True)
@@ -0,0 +1,755 @@
+"""
+Hook Utils - hooks共享的辅助函数
+提供缓存读写等通用逻辑，供各个hook脚本导入使用
+"""
+
+import faulthandler
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，退化为不加锁
+    fcntl = None
+
+CACHE_DIR = os.path.expanduser("~/.claude/cache")
+SESSION_DIR = os.path.join(CACHE_DIR, "sessions")
+METRICS_DIR = os.path.expanduser("~/.claude/logs/metrics")
+
+# 会话状态超过该时间（秒）未更新即视为过期并删除
+SESSION_TTL = 24 * 3600
+
+# 以这些前缀开头的消息视为建议类提示，参与会话内去重
+ADVISORY_PREFIXES = ("💡", "⚡")
+
+# hook的默认延迟预算（毫秒），可通过 CLAUDE_HOOKS_BUDGET_MS 和 CLAUDE_HOOKS_BUDGET_MS_<HOOK名> 覆盖
+DEFAULT_BUDGET_MS = 3000
+# 看门狗线程无法运行（如正则回溯一直持有GIL）时，超出预算这么久后由faulthandler强制退出
+BACKSTOP_GRACE_MS = 1000
+# 超时后写入timeout指标最多等待的时间（秒），日志目录卡住时也能按时退出
+TIMEOUT_METRIC_WAIT = 0.1
+
+MB = 1024 * 1024
+
+# tree_stats 统计结果的默认有效期（秒），过期后重新检查各目录的mtime
+TREE_TTL = 600
+
+# stdin超过该大小（字节）时，read_payload改为按需解析，只解码hook实际访问到的字段
+LAZY_PAYLOAD_BYTES = 64 * 1024
+
+# 当前进程中由run_hook运行的hook状态，record_metric在此期间只记下判定结果，由run_hook统一写入
+_hook_state = None
+
+# 密钥规则: (名称, 置信度, 起始字面量, 正则)
+# 每条正则都从起始字面量处开始匹配：扫描时先用str.find定位字面量，只在这些位置运行合并后的正则。
+# SECRET_NOCASE_RULES 中规则的字面量为小写，在转成小写的文本中查找
+SECRET_RULES = [
+    ("aws_access_key", "high", ["AKIA", "ASIA"], r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b"),
+    (
+        "aws_secret_key",
+        "high",
+        ["secret"],
+        r"(?i:(?<=aws_)|(?<=aws))(?i:secret_?access_?key)[\"']?\s*[:=]\s*[\"']?"
+        r"(?P<aws_secret_key_value>[A-Za-z0-9/+=]{40})(?![A-Za-z0-9/+=])",
+    ),
+    (
+        "github_token",
+        "high",
+        ["ghp_", "gho_", "ghu_", "ghs_", "ghr_"],
+        r"\bgh[pousr]_[A-Za-z0-9]{36,255}\b",
+    ),
+    ("github_pat", "high", ["github_pat_"], r"\bgithub_pat_[A-Za-z0-9_]{22,255}\b"),
+    (
+        "private_key",
+        "high",
+        ["-----BEGIN "],
+        r"-----BEGIN (?:[A-Z0-9]+ )*PRIVATE KEY(?: BLOCK)?-----",
+    ),
+    ("slack_token", "high", ["xox"], r"\bxox[abprs]-[A-Za-z0-9-]{10,}"),
+    (
+        "jwt",
+        "medium",
+        ["eyJ"],
+        r"\beyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}",
+    ),
+    (
+        "generic_secret",
+        "medium",
+        ["key", "secret", "token", "passw"],
+        r"(?i:key|secret|token|passw(?:or)?d)[\"']?\s*[:=]\s*[\"']"
+        r"(?P<generic_secret_value>[A-Za-z0-9_\-+/=.]{20,255})[\"']",
+    ),
+]
+SECRET_NOCASE_RULES = ("aws_secret_key", "generic_secret")
+
+# 合并后的正则，靠前的规则优先
+SECRET_PATTERN = re.compile(
+    "|".join(f"(?P<{name}>{regex})" for name, _, _, regex in SECRET_RULES)
+)
+SECRET_CONFIDENCE = {name: confidence for name, confidence, _, _ in SECRET_RULES}
+SECRET_ANCHORS = sorted(
+    {
+        anchor
+        for name, _, anchors, _ in SECRET_RULES
+        if name not in SECRET_NOCASE_RULES
+        for anchor in anchors
+    }
+)
+SECRET_NOCASE_ANCHORS = sorted(
+    {
+        anchor
+        for name, _, anchors, _ in SECRET_RULES
+        if name in SECRET_NOCASE_RULES
+        for anchor in anchors
+    }
+)
+
+# 不区分大小写的字面量（key、token等）在普通文本中很常见，只在其后紧跟赋值和至少20个字符的值时才作为候选，
+# 每个字面量一个以它开头的正则（字面量前缀可快速定位），在C层完成查找和筛选。
+# 前瞻覆盖 generic_secret（passw(or)d 等后缀、可选引号、[:=]、引号、值）和 aws_secret_key（_access_key 后缀）
+SECRET_NOCASE_GATE = r"(?=[a-z_]{0,12}[\"']?\s*[:=]\s*[\"']?[a-z0-9_\-+/=.]{20})"
+SECRET_NOCASE_FINDERS = [
+    re.compile(re.escape(anchor) + SECRET_NOCASE_GATE)
+    for anchor in SECRET_NOCASE_ANCHORS
+]
+SECRET_NOCASE_BYTES_FINDERS = [
+    re.compile(re.escape(anchor.encode("ascii")) + SECRET_NOCASE_GATE.encode("ascii"))
+    for anchor in SECRET_NOCASE_ANCHORS
+]
+
+# 带值分组的规则要求值的香农熵不低于该阈值（比特/字符），用来排除占位符和示例值
+SECRET_ENTROPY_THRESHOLD = 3.5
+
+# 扫描分块大小和块间重叠（重叠需大于最长的匹配）
+SECRET_CHUNK_SIZE = 1024 * 1024
+SECRET_CHUNK_OVERLAP = 1024
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_json_decoder = json.JSONDecoder()
+
+
+def file_signature(paths):
+    """返回文件的 [mtime_ns, size] 签名列表（文件不存在时为None），用于判断缓存是否失效"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+def load_cache(name):
+    """读取名为name的JSON缓存，不存在或损坏时返回空字典"""
+    try:
+        with open(os.path.join(CACHE_DIR, f"{name}.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(name, data):
+    """原子写入JSON缓存（先写临时文件再rename），并发的hook进程不会读到半个文件"""
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=CACHE_DIR, prefix=f".{name}.", suffix=".tmp"
+        )
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(CACHE_DIR, f"{name}.json"))
+    except OSError:
+        # 缓存写入失败不影响hook结果
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def delete_cache(name):
+    """删除名为name的缓存文件"""
+    try:
+        os.unlink(os.path.join(CACHE_DIR, f"{name}.json"))
+    except OSError:
+        pass
+
+
+def cleanup_sessions(now):
+    """删除过期的会话状态文件"""
+    try:
+        with os.scandir(SESSION_DIR) as entries:
+            for entry in entries:
+                try:
+                    if now - entry.stat().st_mtime > SESSION_TTL:
+                        os.unlink(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+
+def prune_oldest(entries, limit):
+    """限制缓存字典的条目数，丢弃最早写入的条目（更新条目时先pop再写入，使其排到最后）"""
+    while len(entries) > limit:
+        entries.pop(next(iter(entries)))
+
+
+def format_size(size):
+    """把字节数格式化为 MB / GB"""
+    if size >= 1024 * MB:
+        return f"{size / (1024 * MB):.1f}GB"
+    return f"{size / MB:.1f}MB"
+
+
+def list_directory(path):
+    """列出目录，返回 [(名称, 是否目录, 文件大小)]，目录的大小为0，不跟随符号链接"""
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                size = 0 if is_dir else entry.stat(follow_symlinks=False).st_size
+                entries.append((entry.name, is_dir, size))
+            except OSError:
+                continue
+    return entries
+
+
+def walk_directories(start, visit, deadline, state=None):
+    """从start开始深度优先遍历目录树，返回 (已访问的目录集合, 是否遍历完整)
+
+    visit(目录, state) 处理一个目录，返回要继续遍历的 [(子目录, 子目录的state)]，返回None时停止遍历；
+    抛出OSError的目录跳过，不计入已访问。超过deadline（单调时钟）后停止，未访问的目录由调用方下次继续。
+    """
+    visited = set()
+    stack = [(start, state)]
+    while stack:
+        if time.monotonic() > deadline:
+            return visited, False
+        path, state = stack.pop()
+        try:
+            children = visit(path, state)
+        except OSError:
+            continue
+        visited.add(path)
+        if children is None:
+            return visited, False
+        stack.extend(children)
+    return visited, True
+
+
+def tree_stats(path, index, now, deadline, skip_dir=None, limit=None, ttl=TREE_TTL):
+    """统计目录树，返回 (文件数, 总字节数, 是否统计完整)
+
+    index: {目录: [mtime_ns, 自身文件数, 自身字节数, 子目录, 统计时间, 总文件数, 总字节数]}，由调用方保存。
+    有效期内直接使用缓存的总数；过期后逐个检查目录mtime，只重新列出发生变化的目录。
+    skip_dir(名称) 为True的子目录不统计。超过deadline或已统计的字节数超过limit时提前停止，
+    此时结果是下限，未统计完整的目录不记录统计时间，下次从已完成的子目录继续。
+    """
+    results = {}
+    scanned = 0
+
+    def visit(directory, _):
+        nonlocal scanned
+        entry = index.get(directory)
+        if entry and entry[4] and now - entry[4] < ttl:
+            results[directory] = (entry[5], entry[6], True)
+            scanned += entry[6]
+            return None if limit is not None and scanned > limit else []
+        mtime = os.stat(directory).st_mtime_ns
+        if not entry or entry[0] != mtime:
+            files = size = 0
+            subdirs = []
+            for name, is_dir, file_size in list_directory(directory):
+                if not is_dir:
+                    files += 1
+                    size += file_size
+                elif not (skip_dir and skip_dir(name)):
+                    subdirs.append(name)
+            entry = [mtime, files, size, subdirs]
+        index[directory] = entry[:4] + [0, entry[1], entry[2]]
+        scanned += entry[2]
+        if limit is not None and scanned > limit:
+            return None
+        return [(os.path.join(directory, name), None) for name in entry[3]]
+
+    visited, walked = walk_directories(path, visit, deadline)
+
+    # 自底向上汇总各目录的总数，未访问到的子目录只在遍历完整时（目录已不存在）视为空
+    for directory in sorted(visited, key=lambda d: d.count(os.sep), reverse=True):
+        if directory in results:
+            continue
+        entry = index[directory]
+        total_files, total_size, complete = entry[1], entry[2], True
+        for name in entry[3]:
+            sub_files, sub_size, sub_complete = results.get(
+                os.path.join(directory, name), (0, 0, walked)
+            )
+            total_files += sub_files
+            total_size += sub_size
+            complete = complete and sub_complete
+        entry[4:] = [now if complete else 0, total_files, total_size]
+        results[directory] = (total_files, total_size, complete)
+    return results.get(path, (0, 0, True))
+
+
+def _skip_whitespace(data, pos):
+    return _JSON_WHITESPACE.match(data, pos).end()
+
+
+class LazyObject(Mapping):
+    """按需解析的JSON对象
+
+    访问字段时才从上次停下的位置继续向后解析，找到该字段即停止，因此Write的content、
+    MultiEdit的edits等排在后面的大字段只在被访问（或需要其后的字段）时才会解码。
+    nested为True时，值为对象的字段（如tool_input）同样按需解析。
+    """
+
+    def __init__(self, data, pos, nested=False):
+        self._data = data
+        self._nested = nested
+        self._fields = {}
+        # 尚未结束解析的子对象，继续解析本对象前需要先找到它的结尾
+        self._child = None
+        self._end = None
+        self._pos = _skip_whitespace(data, pos + 1)
+        if data[self._pos] == "}":
+            self._end = self._pos + 1
+            self._pos = None
+
+    def _advance(self):
+        """解析下一个字段，已没有更多字段时返回False"""
+        if self._pos is None:
+            return False
+        data = self._data
+        pos = self._pos
+        if self._child is not None:
+            pos = self._child._finish()
+            self._child = None
+        else:
+            if data[pos] != '"':
+                raise ValueError(f"Expecting property name at {pos}")
+            key, pos = json.decoder.scanstring(data, pos + 1)
+            pos = _skip_whitespace(data, pos)
+            if data[pos] != ":":
+                raise ValueError(f"Expecting ':' at {pos}")
+            pos = _skip_whitespace(data, pos + 1)
+            if self._nested and data[pos] == "{":
+                self._fields[key] = self._child = LazyObject(data, pos)
+                self._pos = pos
+                return True
+            self._fields[key], pos = _json_decoder.raw_decode(data, pos)
+
+        pos = _skip_whitespace(data, pos)
+        if data[pos] == "}":
+            self._end = pos + 1
+            self._pos = None
+        elif data[pos] == ",":
+            self._pos = _skip_whitespace(data, pos + 1)
+        else:
+            raise ValueError(f"Expecting ',' delimiter at {pos}")
+        return True
+
+    def _finish(self):
+        """解析剩余的全部字段，返回对象结束后的位置"""
+        while self._advance():
+            pass
+        return self._end
+
+    def __getitem__(self, key):
+        while key not in self._fields:
+            if not self._advance():
+                raise KeyError(key)
+        return self._fields[key]
+
+    def __iter__(self):
+        self._finish()
+        return iter(self._fields)
+
+    def __len__(self):
+        self._finish()
+        return len(self._fields)
+
+    def __bool__(self):
+        # 真值判断（如 tool_use.get("tool_input") or ...）不需要解析全部字段
+        return bool(self._fields) or self._pos is not None
+
+
+def read_payload(need_content=False):
+    """从stdin读取hook的tool_use数据
+
+    大多数hook只需要tool_name、command、file_path等字段。stdin超过 LAZY_PAYLOAD_BYTES 时
+    返回按需解析的 LazyObject，不访问的大字段不会被解码；访问不存在的字段需要解析到结尾，
+    因此应先取 tool_name / tool_input，再退回到 tool / arguments。
+    需要检查写入内容的hook传入need_content=True，总是完整解码为dict。
+    """
+    data = sys.stdin.read()
+    if need_content or len(data) <= LAZY_PAYLOAD_BYTES:
+        return json.loads(data)
+    pos = _skip_whitespace(data, 0)
+    if data[pos : pos + 1] != "{":
+        return json.loads(data)
+    return LazyObject(data, pos, nested=True)
+
+
+def filter_advisories(tool_use, hook_name, messages, prefixes=ADVISORY_PREFIXES):
+    """会话内去重建议类提示，返回本次应输出的消息
+
+    同一条建议在每个会话中只输出一次；设置环境变量 CLAUDE_HOOKS_ADVISORY_INTERVAL（分钟）后，
+    改为每隔该时间最多输出一次（无法解析时按默认值处理）。不以prefixes开头的警告总是输出，没有session_id时不做去重。
+    状态按session_id保存在 ~/.claude/cache/sessions/ 下，通过文件锁支持多个hook并发读写。
+    设置环境变量 CLAUDE_HOOKS_NO_ADVISORY_DEDUPE 时不去重（如批量回放历史记录时）。
+    """
+    session_id = tool_use.get("session_id")
+    if (
+        not session_id
+        or not messages
+        or os.environ.get("CLAUDE_HOOKS_NO_ADVISORY_DEDUPE")
+    ):
+        return messages
+
+    try:
+        interval = float(os.environ.get("CLAUDE_HOOKS_ADVISORY_INTERVAL") or 0) * 60
+    except ValueError:
+        # 无法解析时按默认值处理（每个会话只输出一次）
+        interval = 0
+    session_file = hashlib.sha1(str(session_id).encode("utf-8")).hexdigest()
+    path = os.path.join(SESSION_DIR, f"{session_file}.json")
+    now = time.time()
+
+    try:
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        is_new = not os.path.exists(path)
+        with open(path, "a+", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+
+            result = []
+            changed = False
+            for message in messages:
+                if not message.startswith(prefixes):
+                    result.append(message)
+                    continue
+                digest = hashlib.sha1(message.encode("utf-8")).hexdigest()[:16]
+                key = f"{hook_name}:{digest}"
+                last = state.get(key)
+                if last is None or (interval and now - last >= interval):
+                    state[key] = now
+                    changed = True
+                    result.append(message)
+
+            if changed:
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+    except OSError:
+        # 状态读写失败时不去重
+        return messages
+
+    if is_new:
+        cleanup_sessions(now)
+    return result
+
+
+def log_time():
+    """日志记录使用的当前时间，压力测试在进程内替换该函数来模拟跨午夜"""
+    return datetime.now()
+
+
+def append_log(log_dir, prefix, entry):
+    """追加一条JSON日志到 <log_dir>/<prefix>_YYYYMMDD.log
+
+    文件名日期和timestamp取自同一时刻，跨过午夜时记录不会写进错误的日期文件；
+    整条记录以O_APPEND方式一次write写入，多个hook进程并发追加时不会互相穿插。
+    write只写入部分数据时（如被信号中断）继续写入剩余部分，不留下截断的记录。
+    """
+    now = log_time()
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"{prefix}_{now.strftime('%Y%m%d')}.log")
+
+    log_entry = {"timestamp": now.strftime("%Y-%m-%d %H:%M:%S")}
+    log_entry.update(entry)
+    data = (json.dumps(log_entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+    fd = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def write_metric(hook_name, verdict, fields):
+    """直接写入一条判定记录"""
+    if os.environ.get("CLAUDE_HOOKS_NO_METRICS"):
+        return
+
+    try:
+        log_entry = {"hook": hook_name, "verdict": verdict}
+        log_entry.update(fields)
+        append_log(METRICS_DIR, "metrics", log_entry)
+    except OSError:
+        # 记录失败不应影响hook结果
+        pass
+
+
+def record_metric(hook_name, verdict, **fields):
+    """追加一条hook判定记录到 ~/.claude/logs/metrics/metrics_YYYYMMDD.log
+
+    在run_hook中运行时只记下判定结果，hook结束后与耗时一起写入一条记录。
+    设置环境变量 CLAUDE_HOOKS_NO_METRICS 时不记录（如批量回放历史记录时）。
+    """
+    state = _hook_state
+    if state and state["hook"] == hook_name:
+        state["verdict"] = verdict
+        state["fields"].update(fields)
+        return
+    write_metric(hook_name, verdict, fields)
+
+
+def block(hook_name, message):
+    """输出阻止原因到stderr并记录判定结果，然后以退出码2（阻止操作）退出"""
+    print(message, file=sys.stderr)
+    record_metric(hook_name, "block")
+    sys.exit(2)
+
+
+def fail_open():
+    """之后的步骤超出延迟预算时放行
+
+    fail_closed的hook完成必须的检查后调用，耗时不可控的分析步骤超时后不再阻止操作。
+    """
+    if _hook_state:
+        _hook_state["fail_closed"] = False
+
+
+def budget_remaining(default):
+    """当前hook剩余的延迟预算（秒），不在run_hook中运行时返回default"""
+    if not _hook_state:
+        return default
+    return max(_hook_state["deadline"] - time.monotonic(), 0.0)
+
+
+def hook_budget_ms(hook_name, budget_ms=None):
+    """hook的延迟预算: CLAUDE_HOOKS_BUDGET_MS_<HOOK名> > CLAUDE_HOOKS_BUDGET_MS > budget_ms > 默认值"""
+    env_name = "CLAUDE_HOOKS_BUDGET_MS_" + re.sub(r"\W", "_", hook_name).upper()
+    for value in (os.environ.get(env_name), os.environ.get("CLAUDE_HOOKS_BUDGET_MS")):
+        try:
+            if value:
+                return float(value)
+        except ValueError:
+            continue
+    return float(budget_ms or DEFAULT_BUDGET_MS)
+
+
+def run_hook(main, hook_name, budget_ms=None, fail_closed=False):
+    """在延迟预算内运行hook主函数，并把判定结果和耗时写入指标
+
+    看门狗线程按单调时钟计时（不受系统时间调整影响），超出预算后记录timeout指标并直接退出：
+    默认放行（退出码0），fail_closed的hook阻止操作（退出码2），调用fail_open()之后超时则放行。
+    hook已经得出结果、只是卡在写日志等收尾步骤时，
+    按已得出的结果退出。看门狗线程因GIL被长时间占用而无法运行时，由faulthandler在预算之后再等
+    BACKSTOP_GRACE_MS强制退出（退出码1，即放行）。
+    """
+    global _hook_state
+    budget = hook_budget_ms(hook_name, budget_ms) / 1000
+    start = time.monotonic()
+    deadline = start + budget
+    state = {
+        "hook": hook_name,
+        "verdict": None,
+        "fields": {},
+        "exit_code": None,
+        "fail_closed": fail_closed,
+        "deadline": deadline,
+    }
+    _hook_state = state
+
+    def watchdog():
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 0.05))
+
+        exit_code = state["exit_code"]
+        if exit_code is None:
+            exit_code = 2 if state["fail_closed"] else 0
+            if state["fail_closed"]:
+                print(
+                    f"⏱️ {hook_name} 超过 {budget * 1000:.0f}ms 未完成，已阻止操作",
+                    file=sys.stderr,
+                )
+            fields = {
+                "duration_ms": round((time.monotonic() - start) * 1000, 1),
+                "budget_ms": round(budget * 1000),
+            }
+            writer = threading.Thread(
+                target=write_metric,
+                args=(hook_name, "timeout", fields),
+                daemon=True,
+            )
+            writer.start()
+            writer.join(TIMEOUT_METRIC_WAIT)
+
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(exit_code)
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    try:
+        faulthandler.dump_traceback_later(budget + BACKSTOP_GRACE_MS / 1000, exit=True)
+    except (RuntimeError, ValueError, OSError):
+        pass
+
+    exit_code = 0
+    try:
+        main()
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except Exception:
+        state["exit_code"] = 1
+        write_metric(hook_name, "error", {})
+        raise
+
+    state["exit_code"] = exit_code
+    if exit_code == 2:
+        verdict = "block"
+    elif exit_code != 0:
+        verdict = "error"
+    else:
+        verdict = state["verdict"] or "allow"
+    fields = dict(state["fields"])
+    fields["duration_ms"] = round((time.monotonic() - start) * 1000, 1)
+    _hook_state = None
+    write_metric(hook_name, verdict, fields)
+    faulthandler.cancel_dump_traceback_later()
+    sys.exit(exit_code)
+
+
+def shannon_entropy(value):
+    """计算字符串的香农熵（比特/字符）"""
+    if not value:
+        return 0.0
+    counts = {}
+    for ch in value:
+        counts[ch] = counts.get(ch, 0) + 1
+    length = len(value)
+    return -sum(count / length * math.log2(count / length) for count in counts.values())
+
+
+def secret_candidates(chunk, limit):
+    """返回chunk中[0, limit)范围内所有起始字面量出现的位置"""
+    positions = set()
+
+    def find_all(haystack, anchor):
+        pos = haystack.find(anchor, 0, limit + len(anchor) - 1)
+        while pos != -1:
+            positions.add(pos)
+            pos = haystack.find(anchor, pos + 1, limit + len(anchor) - 1)
+
+    for anchor in SECRET_ANCHORS:
+        find_all(chunk, anchor)
+
+    # ASCII文本按字节转小写，比str.lower快且位置不变
+    if chunk.isascii():
+        lowered = chunk.encode("ascii").lower()
+        finders = SECRET_NOCASE_BYTES_FINDERS
+    else:
+        lowered = chunk.lower()
+        finders = SECRET_NOCASE_FINDERS
+    if len(lowered) == len(chunk):
+        for finder in finders:
+            for match in finder.finditer(lowered):
+                if match.start() >= limit:
+                    break
+                positions.add(match.start())
+    else:
+        # 个别字符转小写后长度会变，位置无法对齐，退回按常见大小写形式查找
+        for anchor in SECRET_NOCASE_ANCHORS:
+            for variant in (anchor, anchor.capitalize(), anchor.upper()):
+                find_all(chunk, variant)
+    return sorted(positions)
+
+
+def scan_secrets(text):
+    """扫描文本中的密钥，返回 [{rule, confidence, start, end}]，按位置排序
+
+    按块扫描，每块只在起始字面量出现的位置运行正则（普通源码约15ms/MB，充满key/token赋值的文本约27ms/MB）。
+    start/end为需要脱敏的范围（规则带值分组时只覆盖值部分），低熵的值视为占位符忽略。
+    """
+    findings = {}
+    for chunk_start in range(0, len(text), SECRET_CHUNK_SIZE):
+        # 相邻块重叠，跨越块边界的密钥也能完整匹配
+        chunk = text[
+            chunk_start : chunk_start + SECRET_CHUNK_SIZE + SECRET_CHUNK_OVERLAP
+        ]
+        for pos in secret_candidates(chunk, SECRET_CHUNK_SIZE):
+            match = SECRET_PATTERN.match(chunk, pos)
+            if not match or "EXAMPLE" in match.group(0):
+                continue
+
+            rule = match.lastgroup
+            value_group = f"{rule}_value"
+            if value_group in SECRET_PATTERN.groupindex:
+                if shannon_entropy(match.group(value_group)) < SECRET_ENTROPY_THRESHOLD:
+                    continue
+                start, end = match.span(value_group)
+            else:
+                start, end = match.span()
+
+            start += chunk_start
+            existing = findings.get(start)
+            if existing and existing["confidence"] == "high":
+                continue
+            findings[start] = {
+                "rule": rule,
+                "confidence": SECRET_CONFIDENCE[rule],
+                "start": start,
+                "end": end + chunk_start,
+            }
+    return [findings[start] for start in sorted(findings)]
+
+
+def redact_secrets(text):
+    """把文本中的密钥替换为 [REDACTED:<规则>]"""
+    if not text:
+        return text
+    parts = []
+    last = 0
+    for finding in scan_secrets(text):
+        if finding["start"] < last:
+            continue
+        parts.append(text[last : finding["start"]])
+        parts.append(f"[REDACTED:{finding['rule']}]")
+        last = finding["end"]
+    parts.append(text[last:])
+    return "".join(parts)
@@ -5,8 +5,172 @@ Java Build Check Hook - Java构建和代码质量检查
 """
 
 import sys
-import json
 import os
+import re
+
+from hook_utils import (
+    file_signature,
+    filter_advisories,
+    load_cache,
+    prune_oldest,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+)
+
+# 影响构建速度的项目配置文件
+PROJECT_CONFIG_FILES = [
+    "gradle.properties",
+    "settings.gradle",
+    "settings.gradle.kts",
+    ".mvn/maven.config",
+    ".mvn/jvm.config",
+    ".mvn/extensions.xml",
+]
+
+# 缓存中最多保留的项目数
+MAX_CACHED_PROJECTS = 100
+
+
+def read_text(path):
+    """读取文本文件，不存在时返回None"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def parse_properties(text):
+    """解析 gradle.properties 为字典"""
+    properties = {}
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", "!")):
+            continue
+        match = re.match(r"([^=:\s]+)\s*[=:]\s*(.*)", line)
+        if match:
+            properties[match.group(1)] = match.group(2).strip()
+    return properties
+
+
+def user_gradle_properties():
+    """用户级 gradle.properties 的路径（$GRADLE_USER_HOME，默认 ~/.gradle）"""
+    gradle_home = os.environ.get("GRADLE_USER_HOME") or os.path.expanduser("~/.gradle")
+    return os.path.join(gradle_home, "gradle.properties")
+
+
+def parse_project_config(root):
+    """解析项目中与构建加速相关的配置
+
+    用户级 gradle.properties 与Gradle的规则一致，优先于项目中的同名属性。
+    """
+    texts = {name: read_text(os.path.join(root, name)) for name in PROJECT_CONFIG_FILES}
+    properties = parse_properties(texts["gradle.properties"])
+    properties.update(parse_properties(read_text(user_gradle_properties())))
+    settings = (texts["settings.gradle"] or "") + (texts["settings.gradle.kts"] or "")
+    maven_config = texts[".mvn/maven.config"] or ""
+    extensions = texts[".mvn/extensions.xml"] or ""
+
+    def enabled(*keys):
+        return any(properties.get(key, "").lower() == "true" for key in keys)
+
+    return {
+        "gradle_build_cache": enabled("org.gradle.caching")
+        or bool(re.search(r"\bbuildCache\s*\{", settings)),
+        "gradle_configuration_cache": enabled(
+            "org.gradle.configuration-cache", "org.gradle.unsafe.configuration-cache"
+        ),
+        "gradle_parallel": enabled("org.gradle.parallel"),
+        "gradle_daemon_disabled": properties.get("org.gradle.daemon", "").lower()
+        == "false",
+        "gradle_test_selection": "predictiveSelection" in settings
+        or "testDistribution" in settings,
+        "maven_threads": bool(
+            re.search(r"(^|\s)(-T|--threads)(\s|=|\d)", maven_config)
+        ),
+        "maven_jvm_config": texts[".mvn/jvm.config"] is not None,
+        "maven_incremental": "gitflow-incremental-builder" in extensions
+        or "develocity-maven-extension" in extensions
+        or "gradle-enterprise-maven-extension" in extensions,
+    }
+
+
+def load_project_config(root):
+    """读取项目配置，按配置文件（含用户级 gradle.properties）mtime缓存，文件未变化时不重新解析"""
+    root = os.path.abspath(root)
+    user_properties = user_gradle_properties()
+    signature = file_signature(
+        [os.path.join(root, name) for name in PROJECT_CONFIG_FILES] + [user_properties]
+    )
+    # GRADLE_USER_HOME 改变时签名也要改变
+    signature.append(user_properties)
+
+    cache = load_cache("java-build-check")
+    entry = cache.get(root)
+    if entry and entry.get("signature") == signature:
+        return entry["config"]
+
+    config = parse_project_config(root)
+    cache.pop(root, None)
+    cache[root] = {"signature": signature, "config": config}
+    prune_oldest(cache, MAX_CACHED_PROJECTS)
+    save_cache("java-build-check", cache)
+    return config
+
+
+def check_build_acceleration(command):
+    """根据项目配置给出构建加速建议"""
+    messages = []
+    is_gradle = re.search(r"(^|[\s/])(gradle|gradlew)\s", command)
+    is_maven = re.search(r"(^|[\s/])(mvn|mvnw)\s", command)
+    if not is_gradle and not is_maven:
+        return messages
+
+    config = load_project_config(".")
+
+    if is_gradle:
+        if not config["gradle_build_cache"]:
+            messages.append(
+                "⚡ 加速: 在 gradle.properties 中设置 org.gradle.caching=true 启用构建缓存"
+            )
+        if not config["gradle_configuration_cache"]:
+            messages.append(
+                "⚡ 加速: 设置 org.gradle.configuration-cache=true 跳过重复的配置阶段"
+            )
+        if not config["gradle_parallel"]:
+            messages.append("⚡ 加速: 设置 org.gradle.parallel=true 并行构建多个子项目")
+        if config["gradle_daemon_disabled"] or "--no-daemon" in command:
+            messages.append(
+                "⚡ 加速: 本地开发时保持Gradle守护进程开启，避免每次冷启动JVM"
+            )
+        if not config["gradle_test_selection"] and re.search(
+            r"\b(test|check|build)\b", command
+        ):
+            messages.append(
+                "💡 建议: 使用 --tests 只运行相关测试，或在 settings.gradle 中配置测试选择（predictiveSelection）"
+            )
+
+    if is_maven:
+        if not config["maven_threads"] and not re.search(
+            r"(\s-T\s*\S|--threads)", command
+        ):
+            messages.append(
+                "⚡ 加速: 在 .mvn/maven.config 中添加 -T 1C 按CPU核数并行构建模块"
+            )
+        if not config["maven_jvm_config"]:
+            messages.append(
+                "⚡ 加速: 在 .mvn/jvm.config 中配置 -XX:+TieredCompilation -XX:TieredStopAtLevel=1 缩短Maven启动时间"
+            )
+        if not config["maven_incremental"] and re.search(
+            r"\b(test|verify|install|package)\b", command
+        ):
+            messages.append(
+                "💡 建议: 使用 -Dtest=... 或 gitflow-incremental-builder 扩展只构建和测试改动的模块"
+            )
+
+    return messages
 
 
 def check_java_command(command):
@@ -56,30 +220,33 @@ def check_java_command(command):
         if "prod" in command.lower() and "-XX:+UseG1GC" not in command:
             messages.append("💡 建议: 生产环境考虑使用 -XX:+UseG1GC 垃圾收集器")
 
+    messages.extend(check_build_acceleration(command))
+
     return messages
 
 
 def main():
     """主函数"""
     try:
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Bash命令
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool != "Bash":
             sys.exit(0)
 
         # 获取命令
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         command = arguments.get("command", "")
 
         # 检查Java相关命令
         java_keywords = ["java", "mvn", "gradle", "gradlew", "jar"]
         if any(keyword in command for keyword in java_keywords):
             messages = check_java_command(command)
+            messages = filter_advisories(tool_use, "java-build-check", messages)
             if messages:
                 print("\n".join(messages))
+                record_metric("java-build-check", "warn")
 
         # 总是允许操作
         sys.exit(0)
@@ -90,4 +257,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "java-build-check")
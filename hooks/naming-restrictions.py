@@ -4,11 +4,12 @@ Naming restrictions hook for Claude Code
 Prevents only the worst naming conventions
 """
 
-import json
 import sys
 import re
 import os
 
+from hook_utils import block, read_payload, run_hook
+
 
 def check_naming(name, context="file"):
     """Check if a name violates basic naming conventions"""
@@ -45,7 +46,7 @@ def check_naming(name, context="file"):
 def main():
     try:
         # Read input from Claude Code
-        input_data = json.load(sys.stdin)
+        input_data = read_payload()
 
         # Extract the relevant field based on tool type
         tool_name = input_data.get("tool_name", "")
@@ -106,8 +107,7 @@ def main():
 
                 # Output error to stderr and exit with code 2
                 error_msg = f"⚠️  Poor {context} naming detected: '{basename}'. {suggestion_text}"
-                print(error_msg, file=sys.stderr)
-                sys.exit(2)  # Exit code 2 = blocking error
+                block("naming-restrictions", error_msg)
 
         # If no violations, exit silently
         sys.exit(0)
@@ -118,4 +118,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "naming-restrictions")
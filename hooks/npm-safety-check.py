@@ -7,6 +7,238 @@ NPM Safety Check Hook - NPM/Yarn操作安全检查
 import sys
 import json
 import re
+import os
+import hashlib
+
+from hook_utils import (
+    delete_cache,
+    file_signature,
+    load_cache,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+)
+
+# 已知有问题的包
+SUSPICIOUS_PACKAGES = [
+    "node-ipc",  # 曾有恶意代码事件
+    "colors",  # 曾有恶意代码事件
+    "faker",  # 已被作者删除
+]
+
+# 支持的lockfile，按优先级排列
+LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml"]
+
+# 会按lockfile安装全部依赖的命令（yarn只匹配不带参数的yarn、yarn install、yarn add，不匹配yarn test等）
+INSTALL_PATTERN = re.compile(
+    r"\b(npm\s+(install|i|ci|add)|pnpm\s+(install|i|add))(\s|$|;|&)"
+    r"|\byarn(\s+(install|add)\b|\s*($|;|&|\|))"
+)
+
+PACKAGE_LOCK_KEY = re.compile(r'^\s*(?:"((?:[^"\\]|\\.)*)":\s*)?\{\s*$')
+PACKAGE_LOCK_VERSION = re.compile(r'^\s*"version":\s*"([^"]*)"')
+YARN_VERSION = re.compile(r'^  version:?\s+"?([^"\s]+)"?')
+
+
+def package_lock_entry_name(stack):
+    """根据对象所在路径推断包名（v2/v3的packages段或v1的dependencies段）"""
+    key = stack[-1] if stack else None
+    if not key:
+        return None
+    if "node_modules/" in key:
+        return key.rsplit("node_modules/", 1)[1]
+    if len(stack) >= 2 and stack[-2] == "dependencies":
+        return key
+    return None
+
+
+def iter_json_lock(data):
+    """从完整解析的package-lock.json中提取 (包名, 版本)"""
+    for key, info in data.get("packages", {}).items():
+        if "node_modules/" in key and isinstance(info, dict) and "version" in info:
+            yield key.rsplit("node_modules/", 1)[1], info["version"]
+
+    stack = [data.get("dependencies", {})]
+    while stack:
+        for name, info in stack.pop().items():
+            if isinstance(info, dict):
+                if "version" in info:
+                    yield name, info["version"]
+                stack.append(info.get("dependencies", {}))
+
+
+def iter_package_lock(path):
+    """逐行流式解析npm格式化输出的package-lock.json，无需整体载入内存"""
+    with open(path, "r", encoding="utf-8") as f:
+        if f.readline().strip() != "{":
+            # 不是npm的格式化输出，退回完整解析
+            f.seek(0)
+            yield from iter_json_lock(json.load(f))
+            return
+
+        stack = []
+        for line in f:
+            match = PACKAGE_LOCK_KEY.match(line)
+            if match:
+                stack.append(match.group(1))
+                continue
+            if line.lstrip().startswith("}"):
+                if stack:
+                    stack.pop()
+                continue
+            match = PACKAGE_LOCK_VERSION.match(line)
+            if match:
+                name = package_lock_entry_name(stack)
+                if name:
+                    yield name, match.group(1)
+
+
+def yarn_spec_name(spec):
+    """从 'pkg@^1.0.0' 或 '@scope/pkg@npm:^1.0.0' 中提取包名"""
+    spec = spec.strip().strip('"')
+    at = spec.find("@", 1)
+    return spec[:at] if at > 0 else spec
+
+
+def iter_yarn_lock(path):
+    """逐行解析yarn.lock（v1和berry格式）"""
+    names = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            if not line[0].isspace():
+                specs = line.rstrip().rstrip(":")
+                names = {yarn_spec_name(spec) for spec in specs.split(", ")}
+                continue
+            match = YARN_VERSION.match(line)
+            if match and names:
+                for name in names:
+                    yield name, match.group(1)
+                names = set()
+
+
+def iter_pnpm_lock(path):
+    """逐行解析pnpm-lock.yaml的packages/snapshots段"""
+    section = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if not line[0].isspace():
+                section = line.strip().rstrip(":")
+                continue
+            if section not in ("packages", "snapshots"):
+                continue
+            if not line.startswith("  ") or line[2].isspace():
+                continue
+
+            key = line.strip().rstrip(":").strip("'\"").lstrip("/")
+            key = key.split("(", 1)[0]
+            at = key.rfind("@")
+            if at > 0:
+                name, version = key[:at], key[at + 1 :]
+            else:
+                # pnpm v5格式: /name/version
+                name, _, version = key.rpartition("/")
+            if name and version:
+                yield name, version.split("_", 1)[0]
+
+
+def hash_file(path):
+    """计算文件的sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_lock_index(path):
+    """解析lockfile，返回 {包名: [版本]} 索引"""
+    basename = os.path.basename(path)
+    if basename == "yarn.lock":
+        entries = iter_yarn_lock(path)
+    elif basename == "pnpm-lock.yaml":
+        entries = iter_pnpm_lock(path)
+    else:
+        entries = iter_package_lock(path)
+
+    index = {}
+    for name, version in entries:
+        versions = index.setdefault(name, [])
+        if version not in versions:
+            versions.append(version)
+    return index
+
+
+def load_lock_index(path, entry, signature):
+    """读取lockfile的 name@version 索引，返回 (索引, 内容hash)
+
+    mtime和大小未变化时直接使用缓存；变化时先比对内容hash，内容相同（如git checkout后）仍复用索引，
+    只有内容真正改变时才重新解析。
+    """
+    if entry.get("signature") == signature:
+        index = load_cache(f"npm-lock-{entry['sha256']}").get("packages")
+        if index is not None:
+            return index, entry["sha256"]
+
+    sha256 = hash_file(path)
+    index = load_cache(f"npm-lock-{sha256}").get("packages")
+    if index is None:
+        index = build_lock_index(path)
+        save_cache(f"npm-lock-{sha256}", {"path": path, "packages": index})
+        if entry.get("sha256") and entry["sha256"] != sha256:
+            delete_cache(f"npm-lock-{entry['sha256']}")
+    return index, sha256
+
+
+def find_suspicious_dependencies(path):
+    """返回lockfile中命中SUSPICIOUS_PACKAGES的 {包名: [版本]}
+
+    命中结果随lockfile签名一起缓存，lockfile和包列表都未变化时无需载入完整索引。
+    """
+    path = os.path.abspath(path)
+    signature = file_signature([path])
+    lockfiles = load_cache("npm-lockfiles")
+    entry = lockfiles.get(path, {})
+
+    if (
+        entry.get("signature") == signature
+        and entry.get("suspicious") == SUSPICIOUS_PACKAGES
+    ):
+        return entry["hits"]
+
+    index, sha256 = load_lock_index(path, entry, signature)
+    hits = {pkg: index[pkg] for pkg in SUSPICIOUS_PACKAGES if pkg in index}
+    lockfiles[path] = {
+        "signature": signature,
+        "sha256": sha256,
+        "suspicious": SUSPICIOUS_PACKAGES,
+        "hits": hits,
+    }
+    save_cache("npm-lockfiles", lockfiles)
+    return hits
+
+
+def check_lockfile_dependencies(command):
+    """检查lockfile中的全部（含间接）依赖是否包含有问题的包"""
+    messages = []
+    if not INSTALL_PATTERN.search(command):
+        return messages
+
+    for lockfile in LOCKFILES:
+        if not os.path.isfile(lockfile):
+            continue
+        for pkg, versions in find_suspicious_dependencies(lockfile).items():
+            specs = ", ".join(f"{pkg}@{version}" for version in versions)
+            messages.append(
+                f"⚠️ 警告: {lockfile} 中包含曾有安全问题的包 {specs}（可能是间接依赖），请确认版本"
+            )
+        break
+
+    return messages
 
 
 def check_npm_command(command):
@@ -31,13 +263,7 @@ def check_npm_command(command):
             messages.append(f"⚠️ 注意: {warning}")
 
     # 检查是否安装了已知的有问题的包
-    suspicious_packages = [
-        "node-ipc",  # 曾有恶意代码事件
-        "colors",  # 曾有恶意代码事件
-        "faker",  # 已被作者删除
-    ]
-
-    for pkg in suspicious_packages:
+    for pkg in SUSPICIOUS_PACKAGES:
         if f"install {pkg}" in command or f"add {pkg}" in command:
             messages.append(f"⚠️ 警告: 包 '{pkg}' 曾有安全问题，请谨慎使用")
 
@@ -47,22 +273,27 @@ def check_npm_command(command):
             "💡 建议: 在CI环境中使用 'npm ci' 而不是 'npm install' 以获得更快和更可靠的安装"
         )
 
+    # 检查lockfile中的间接依赖
+    try:
+        messages.extend(check_lockfile_dependencies(command))
+    except (OSError, ValueError):
+        pass
+
     return messages
 
 
 def main():
     """主函数"""
     try:
-        tool_use_json = sys.stdin.read()
-        tool_use = json.loads(tool_use_json)
+        tool_use = read_payload()
 
         # 只处理Bash命令
-        tool = tool_use.get("tool") or tool_use.get("tool_name")
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
         if tool != "Bash":
             sys.exit(0)
 
         # 获取命令
-        arguments = tool_use.get("arguments") or tool_use.get("tool_input", {})
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
         command = arguments.get("command", "")
 
         # 检查npm/yarn命令
@@ -71,6 +302,7 @@ def main():
             if messages:
                 # 输出警告到stdout，不阻止操作
                 print("\n".join(messages))
+                record_metric("npm-safety-check", "warn")
 
         # 总是允许操作
         sys.exit(0)
@@ -81,4 +313,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "npm-safety-check")
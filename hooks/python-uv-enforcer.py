@@ -1,79 +1,305 @@
 #!/usr/bin/env python3
 """
 Python UV Enforcer Hook - 强制使用 uv 代替传统 Python 工具
+
+运行模式通过环境变量 CLAUDE_UV_ENFORCER_MODE 配置:
+  block   - 阻止命令并提示uv用法（默认）
+  rewrite - 返回PreToolUse决策，自动改写为uv命令后执行，省去一次重试
+改写后的命令默认按用户的权限规则决定是否需要确认；CLAUDE_UV_ENFORCER_DECISION 设为 ask 或 allow
+时，改写后的命令总是请用户确认或直接放行。
+仓库中存在 .claude/no-uv-enforcer 文件时跳过检查。
 """
 
 import json
 import sys
 import re
+import os
+
+from hook_utils import block, read_payload, record_metric, run_hook
+
+PYTHON_TOOLS = [
+    "pip",
+    "pip3",
+    "python",
+    "python3",
+    "pytest",
+    "pylint",
+    "flake8",
+    "black",
+    "mypy",
+    "isort",
+    "poetry",
+    "pipenv",
+    "conda",
+    "virtualenv",
+    "pyenv",
+]
+
+# 可以改写为 uv run 的工具
+UV_RUN_TOOLS = [
+    "python",
+    "python3",
+    "pytest",
+    "pylint",
+    "flake8",
+    "black",
+    "mypy",
+    "isort",
+]
+
+# uv pip 支持的子命令
+UV_PIP_COMMANDS = [
+    "install",
+    "uninstall",
+    "freeze",
+    "list",
+    "show",
+    "tree",
+    "check",
+    "compile",
+    "sync",
+]
+
+# CLAUDE_UV_ENFORCER_DECISION 可选的权限决策
+PERMISSION_DECISIONS = ("ask", "allow")
+
+# 仓库级别的退出开关（相对于仓库根目录）
+OPT_OUT_FILE = os.path.join(".claude", "no-uv-enforcer")
+
+TOOL_PATTERN = re.compile(r"^(" + "|".join(PYTHON_TOOLS) + r")\b")
+ENV_PREFIX_PATTERN = re.compile(
+    r"^((?:[A-Za-z_][A-Za-z0-9_]*=\S*\s+)*)(.*)$", re.DOTALL
+)
+
+
+def is_opted_out(start="."):
+    """从当前目录向上查找退出开关文件"""
+    path = os.path.abspath(start)
+    while True:
+        if os.path.exists(os.path.join(path, OPT_OUT_FILE)):
+            return True
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+
+
+HEREDOC_PATTERN = re.compile(
+    r"<<(-?)[ \t]*(?:'([^']*)'|\"([^\"]*)\"|([^\s;&|<>()'\"]+))"
+)
+
+
+def skip_heredocs(command, pos, heredocs):
+    """从pos（heredoc正文开头）跳过各heredoc的正文，返回最后一个结束标记所在行的行尾位置"""
+    for index, (word, strip_tabs) in enumerate(heredocs):
+        while True:
+            if pos >= len(command):
+                return len(command)
+            end = command.find("\n", pos)
+            if end == -1:
+                end = len(command)
+            line = command[pos:end]
+            if (line.lstrip("\t") if strip_tabs else line) == word:
+                break
+            pos = end + 1
+        pos = end if index == len(heredocs) - 1 else end + 1
+    return pos
+
+
+def split_segments(command):
+    """按 && || ; | & 和换行拆分复合命令，返回 [(片段, 分隔符)]
+
+    忽略引号内的分隔符；heredoc的正文是数据而不是命令，连同结束标记一起保留在所属片段中。
+    """
+    segments = []
+    current = []
+    quote = None
+    heredocs = []
+    i = 0
+    while i < len(command):
+        ch = command[i]
+        heredoc = None
+        if not quote and command.startswith("<<<", i):
+            # here-string不是heredoc
+            current.append("<<<")
+            i += 3
+            continue
+        if not quote and command.startswith("<<", i):
+            heredoc = HEREDOC_PATTERN.match(command, i)
+        if quote:
+            current.append(ch)
+            if ch == quote:
+                quote = None
+            elif ch == "\\" and quote == '"' and i + 1 < len(command):
+                current.append(command[i + 1])
+                i += 1
+        elif heredoc:
+            word = next(group for group in heredoc.groups()[1:] if group is not None)
+            heredocs.append((word, heredoc.group(1) == "-"))
+            current.append(heredoc.group(0))
+            i = heredoc.end()
+            continue
+        elif ch == "\n" and heredocs:
+            end = skip_heredocs(command, i + 1, heredocs)
+            current.append(command[i:end])
+            heredocs = []
+            i = end
+            continue
+        elif ch in "'\"":
+            quote = ch
+            current.append(ch)
+        elif ch == "\\" and i + 1 < len(command):
+            current.append(command[i : i + 2])
+            i += 1
+        elif command.startswith(("&&", "||"), i):
+            segments.append(("".join(current), command[i : i + 2]))
+            current = []
+            i += 1
+        elif ch in ";|\n" or (
+            # 后台运行的 &，不包括 2>&1、&> 等重定向
+            ch == "&"
+            and command[i - 1 : i] not in (">", "<")
+            and command[i + 1 : i + 2] != ">"
+        ):
+            segments.append(("".join(current), ch))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    segments.append(("".join(current), ""))
+    return segments
+
+
+def check_segment(segment):
+    """检查单个命令片段，返回 (是否违规, 改写后的片段)，无法改写时片段为None"""
+    stripped = segment.lstrip()
+    leading = segment[: len(segment) - len(stripped)]
+    env, rest = ENV_PREFIX_PATTERN.match(stripped).groups()
+
+    match = TOOL_PATTERN.match(rest)
+    if not match or re.match(r"python3?\s+-m\s+venv\b", rest):
+        return False, segment
+
+    tool = match.group(1)
+    args = rest[match.end() :]
+    if args and not args[0].isspace():
+        # 如 python3.11、pip-compile，无法安全改写
+        return True, None
+
+    pip_match = re.match(r"python3?\s+-m\s+pip\b", rest)
+    if pip_match:
+        tool, args = "pip", rest[pip_match.end() :]
+
+    if tool in ("pip", "pip3"):
+        subcommand = args.split()[0] if args.split() else ""
+        if subcommand not in UV_PIP_COMMANDS:
+            return True, None
+        rewritten = f"uv pip{args}"
+    elif tool in UV_RUN_TOOLS:
+        rewritten = f"uv run {rest}"
+    else:
+        return True, None
+
+    return True, leading + env + rewritten
+
+
+def rewrite_command(command):
+    """检查复合命令的每个片段，返回 (是否违规, 改写后的命令)
+
+    存在无法改写的片段时，改写后的命令为None。
+    """
+    violated = False
+    parts = []
+    for segment, separator in split_segments(command):
+        segment_violated, rewritten = check_segment(segment)
+        if segment_violated:
+            violated = True
+            if rewritten is None:
+                return True, None
+        parts.append(rewritten + separator)
+    return violated, "".join(parts)
+
+
+def is_plain_command(command):
+    """是否为单条普通命令（不含复合命令分隔符、子shell、命令替换或分组）"""
+    return len(split_segments(command)) == 1 and not re.search(r"[(){}`]", command)
+
+
+def rewrite_decision(tool_input, rewritten):
+    """构造PreToolUse决策，用改写后的命令替换原命令
+
+    默认不给出权限决策，改写后的命令按用户的权限规则处理（已允许 uv run pytest 时直接执行）；
+    CLAUDE_UV_ENFORCER_DECISION 为 ask 或 allow 时使用该决策。
+    """
+    output = {
+        "hookEventName": "PreToolUse",
+        "updatedInput": dict(tool_input, command=rewritten),
+    }
+    decision = os.environ.get("CLAUDE_UV_ENFORCER_DECISION", "").strip().lower()
+    if decision in PERMISSION_DECISIONS:
+        output["permissionDecision"] = decision
+        output["permissionDecisionReason"] = f"已自动改写为uv命令: {rewritten}"
+    return {"hookSpecificOutput": output}
+
+
+def block_message(command, rewritten):
+    """构造阻止命令时的提示信息，能改写时直接给出完整的uv命令"""
+    # ANSI color codes
+    red = "\033[1;31m"
+    yellow = "\033[1;33m"
+    green = "\033[1;32m"
+    blue = "\033[1;34m"
+    reset = "\033[0m"
+
+    error_msg = f"""{red}❌ Direct Python tool usage detected!{reset}
+{yellow}📝 Command blocked:{reset} {command}"""
+
+    # Provide specific suggestions
+    suggestion = None
+    if rewritten is not None:
+        suggestion = rewritten
+    elif "pip" in command and "install" in command:
+        suggestion = "uv pip install ..."
+    elif command.startswith("python"):
+        suggestion = "uv run python ..."
+    elif command.startswith("pytest"):
+        suggestion = "uv run pytest ..."
+    elif command.startswith("black"):
+        suggestion = "uv run black ..."
+    elif command.startswith("mypy"):
+        suggestion = "uv run mypy ..."
+    elif is_plain_command(command):
+        suggestion = f"uv run {command}"
+    # 复合命令或子shell无法整体套上uv run，不给出具体写法
+
+    if suggestion:
+        error_msg += f"\n{green}✨ Use uv instead:{reset}\n   {suggestion}"
+    error_msg += f"\n{blue}💡 Learn more:{reset} https://github.com/astral-sh/uv"
+    return error_msg
 
 
 def main():
     try:
         # Read input from Claude Code
-        input_data = json.load(sys.stdin)
+        input_data = read_payload()
 
         tool_name = input_data.get("tool_name", "")
         tool_input = input_data.get("tool_input", {})
 
-        if tool_name == "Bash":
+        if tool_name == "Bash" and not is_opted_out():
             command = tool_input.get("command", "")
 
-            # Check for Python tools
-            python_tools = [
-                "pip",
-                "pip3",
-                "python",
-                "python3",
-                "pytest",
-                "pylint",
-                "flake8",
-                "black",
-                "mypy",
-                "isort",
-                "poetry",
-                "pipenv",
-                "conda",
-                "virtualenv",
-                "pyenv",
-            ]
-
-            # Check if command uses Python tools (but not venv or uv)
-            pattern = r"^(" + "|".join(python_tools) + r")\b"
-            if re.match(pattern, command) and not re.match(
-                r"^(python3?\s+-m\s+venv|uv\s+)", command
-            ):
-                # ANSI color codes
-                red = "\033[1;31m"
-                yellow = "\033[1;33m"
-                green = "\033[1;32m"
-                blue = "\033[1;34m"
-                reset = "\033[0m"
-
-                error_msg = f"""{red}❌ Direct Python tool usage detected!{reset}
-{yellow}📝 Command blocked:{reset} {command}
-{green}✨ Use uv instead:{reset}"""
-
-                # Provide specific suggestions
-                if "pip" in command and "install" in command:
-                    error_msg += "\n   uv pip install ..."
-                elif command.startswith("python"):
-                    error_msg += "\n   uv run python ..."
-                elif command.startswith("pytest"):
-                    error_msg += "\n   uv run pytest ..."
-                elif command.startswith("black"):
-                    error_msg += "\n   uv run black ..."
-                elif command.startswith("mypy"):
-                    error_msg += "\n   uv run mypy ..."
-                else:
-                    error_msg += f"\n   uv run {command}"
-
-                error_msg += (
-                    f"\n{blue}💡 Learn more:{reset} https://github.com/astral-sh/uv"
-                )
-
-                print(error_msg, file=sys.stderr)
-                sys.exit(2)  # Exit code 2 = blocking error
+            # Check every segment of compound commands (but not venv or uv)
+            violated, rewritten = rewrite_command(command)
+            if violated:
+                mode = os.environ.get("CLAUDE_UV_ENFORCER_MODE", "block")
+                if mode == "rewrite" and rewritten is not None:
+                    decision = rewrite_decision(tool_input, rewritten)
+                    print(json.dumps(decision, ensure_ascii=False))
+                    record_metric("python-uv-enforcer", "rewrite")
+                    sys.exit(0)
+
+                block("python-uv-enforcer", block_message(command, rewritten))
 
         # If no violation, exit silently
         sys.exit(0)
@@ -84,4 +310,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "python-uv-enforcer")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Read Size Guard Hook - 读取/搜索前的大小检查
+在 Read / Grep / Glob 执行前估算开销：Read 通过stat获取文件大小，Grep / Glob 通过目录大小索引
+估算目录树的文件数和总大小，超过阈值时警告或阻止，并建议更小的路径或分段读取。
+命名管道、设备文件等读取会一直阻塞的路径直接阻止。
+
+目录大小索引按所在的git仓库（不在仓库中时按搜索路径）分别缓存在
+~/.claude/cache/read-size-guard-<hash>.json，按目录mtime增量刷新。
+
+阈值（环境变量）:
+  CLAUDE_READ_WARN_MB / CLAUDE_READ_BLOCK_MB       单个文件（默认10 / 100）
+  CLAUDE_SEARCH_WARN_FILES / CLAUDE_SEARCH_BLOCK_FILES   搜索的文件数（默认20000 / 200000）
+  CLAUDE_SEARCH_WARN_MB / CLAUDE_SEARCH_BLOCK_MB   搜索的总大小（默认500 / 5000）
+"""
+
+import sys
+import os
+import hashlib
+import stat
+import time
+
+from hook_utils import (
+    MB,
+    TREE_TTL,
+    block,
+    delete_cache,
+    format_size,
+    load_cache,
+    read_payload,
+    record_metric,
+    run_hook,
+    save_cache,
+    tree_stats,
+)
+
+# 统计目录树的时间预算（秒），超出后使用已统计的部分作为下限，下次调用继续统计
+SCAN_BUDGET = 0.3
+# 每个索引文件中最多保留的目录数（每次搜索都要读取所在仓库的整个索引文件）
+MAX_INDEX_DIRS = 20000
+
+# Grep/Glob 默认跳过隐藏目录，这些目录通常也已被 .gitignore 忽略
+SKIP_DIRS = {"node_modules", "target", "__pycache__", ".git"}
+
+# 提示中列出的最大子目录数
+MAX_SUGGESTIONS = 5
+
+
+def env_number(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def is_skipped(name):
+    return name.startswith(".") or name in SKIP_DIRS
+
+
+def index_name(path):
+    """path所在索引的缓存名：按最近的git仓库根目录分片，不在仓库中时使用path本身"""
+    root = path
+    while not os.path.exists(os.path.join(root, ".git")):
+        parent = os.path.dirname(root)
+        if parent == root:
+            root = path
+            break
+        root = parent
+    return "read-size-guard-" + hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+
+
+def prune_index(index):
+    """限制索引大小，丢弃最久未刷新的目录"""
+    if len(index) <= MAX_INDEX_DIRS:
+        return
+    keep = sorted(index, key=lambda path: index[path][4], reverse=True)
+    for path in keep[MAX_INDEX_DIRS:]:
+        del index[path]
+
+
+def largest_subdirs(path, index):
+    """从索引中取出最大的几个子目录，用于提示缩小搜索范围"""
+    entry = index.get(path)
+    if not entry:
+        return []
+    children = []
+    for name in entry[3]:
+        child = index.get(os.path.join(path, name))
+        if child:
+            children.append((child[5], child[6], name))
+    children.sort(reverse=True)
+    return children[:MAX_SUGGESTIONS]
+
+
+def check_read(arguments):
+    """检查Read的目标文件，返回 (级别, 消息)，无问题时返回None"""
+    file_path = arguments.get("file_path", "")
+    try:
+        st = os.stat(file_path)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        stat.S_ISFIFO(st.st_mode)
+        or stat.S_ISCHR(st.st_mode)
+        or stat.S_ISSOCK(st.st_mode)
+    ):
+        return "block", f"🚨 {file_path} 是命名管道/设备文件，读取可能一直阻塞"
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    # 指定了offset/limit时只读取一部分
+    if arguments.get("offset") or arguments.get("limit"):
+        return None
+
+    size = st.st_size
+    suggestion = (
+        "💡 请使用 offset/limit 分段读取，或先用 Grep 定位需要的内容"
+        f"（也可以用 tail -n 200 {file_path} 查看末尾）"
+    )
+    if size > env_number("CLAUDE_READ_BLOCK_MB", 100) * MB:
+        return (
+            "block",
+            f"🚨 {file_path} 大小为 {format_size(size)}，整体读取会耗尽上下文\n{suggestion}",
+        )
+    if size > env_number("CLAUDE_READ_WARN_MB", 10) * MB:
+        return "warn", f"⚠️ {file_path} 大小为 {format_size(size)}\n{suggestion}"
+    return None
+
+
+def check_search(tool, arguments):
+    """检查Grep/Glob的搜索范围，返回 (级别, 消息)，无问题时返回None"""
+    path = os.path.abspath(os.path.expanduser(arguments.get("path") or "."))
+    if tool == "Glob" and "**" not in arguments.get("pattern", ""):
+        # 不带 ** 的模式只匹配固定层级，开销很小
+        return None
+    if not os.path.isdir(path):
+        return None
+
+    cache_name = index_name(path)
+    cache = load_cache(cache_name)
+    index = cache.setdefault("dirs", {})
+    now = time.time()
+    entry = index.get(path)
+    fresh = entry and entry[4] and now - entry[4] < TREE_TTL
+    files, size, complete = tree_stats(
+        path, index, now, time.monotonic() + SCAN_BUDGET, skip_dir=is_skipped
+    )
+    suggestions = largest_subdirs(path, index)
+    if not fresh:
+        prune_index(index)
+        save_cache(cache_name, cache)
+        # 旧版本所有目录共用的索引文件
+        delete_cache("read-size-guard")
+
+    prefix = "" if complete else "至少 "
+    summary = f"{path} 下有 {prefix}{files} 个文件（{prefix}{format_size(size)}）"
+
+    level = None
+    if (
+        files > env_number("CLAUDE_SEARCH_BLOCK_FILES", 200000)
+        or size > env_number("CLAUDE_SEARCH_BLOCK_MB", 5000) * MB
+    ):
+        level = "block"
+    elif (
+        files > env_number("CLAUDE_SEARCH_WARN_FILES", 20000)
+        or size > env_number("CLAUDE_SEARCH_WARN_MB", 500) * MB
+    ):
+        level = "warn"
+    if not level:
+        return None
+
+    # 已经用glob/type缩小文件类型时只警告
+    if level == "block" and (arguments.get("glob") or arguments.get("type")):
+        level = "warn"
+
+    lines = [f"{'🚨' if level == 'block' else '⚠️'} {tool} 搜索范围过大: {summary}"]
+    if suggestions:
+        lines.append("💡 可以缩小到具体的子目录:")
+        for sub_files, sub_size, name in suggestions:
+            lines.append(
+                f"   - {os.path.join(path, name)}（{sub_files} 个文件，{format_size(sub_size)}）"
+            )
+    if tool == "Grep":
+        lines.append("💡 也可以用 glob 或 type 参数限定文件类型")
+    return level, "\n".join(lines)
+
+
+def main():
+    """主函数"""
+    try:
+        tool_use = read_payload()
+
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
+
+        if tool == "Read":
+            result = check_read(arguments)
+        elif tool in ("Grep", "Glob"):
+            result = check_search(tool, arguments)
+        else:
+            result = None
+
+        if result:
+            level, message = result
+            if level == "block":
+                block("read-size-guard", message)
+            print(message)
+            record_metric("read-size-guard", "warn")
+
+        sys.exit(0)
+
+    except Exception:
+        # 出错时不阻止操作
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    run_hook(main, "read-size-guard")
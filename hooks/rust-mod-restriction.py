@@ -4,15 +4,16 @@ Rust mod.rs restriction hook for Claude Code
 Prevents creation of mod.rs files in Rust projects
 """
 
-import json
 import sys
 import os
 
+from hook_utils import block, read_payload, run_hook
+
 
 def main():
     try:
         # Read input from Claude Code
-        input_data = json.load(sys.stdin)
+        input_data = read_payload()
 
         # Extract the relevant field based on tool type
         tool_name = input_data.get("tool_name", "")
@@ -38,8 +39,7 @@ def main():
   - 使用独立的模块文件（如 module_name.rs）
   - 使用目录名加模块文件（如 module_name/submodule.rs，在 module_name.rs 中声明）"""
 
-                print(error_msg, file=sys.stderr)
-                sys.exit(2)  # Exit code 2 = blocking error
+                block("rust-mod-restriction", error_msg)
 
         # If no violations, exit silently
         sys.exit(0)
@@ -50,4 +50,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_hook(main, "rust-mod-restriction")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Secret Scanner Hook - 写入前扫描密钥
+检查 Write/Edit/MultiEdit 将要写入的内容，发现AWS密钥、GitHub/Slack令牌、私钥等高置信度密钥时阻止写入，
+发现JWT、疑似密码赋值等中等置信度内容时给出警告。
+同一行带有 "pragma: allowlist secret" 注释时忽略该行。
+"""
+
+import sys
+
+from hook_utils import block, read_payload, record_metric, run_hook, scan_secrets
+
+ALLOWLIST_MARKER = "pragma: allowlist secret"
+
+# 提示中最多列出的发现数
+MAX_REPORTED = 5
+
+
+def collect_texts(tool, arguments):
+    """返回将要写入的文本列表"""
+    if tool == "Write":
+        return [arguments.get("content", "")]
+    if tool == "Edit":
+        return [arguments.get("new_string", "")]
+    if tool == "MultiEdit":
+        return [edit.get("new_string", "") for edit in arguments.get("edits", [])]
+    return []
+
+
+def line_bounds(text, start):
+    """返回start所在行的 (行号, 行首位置, 行尾位置)"""
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", start)
+    if line_end == -1:
+        line_end = len(text)
+    return text.count("\n", 0, start) + 1, line_start, line_end
+
+
+def find_secrets(texts):
+    """扫描所有文本，返回 [(规则, 置信度, 行号)]，跳过带白名单注释的行"""
+    results = []
+    for text in texts:
+        if not isinstance(text, str) or not text:
+            continue
+        for finding in scan_secrets(text):
+            line_no, line_start, line_end = line_bounds(text, finding["start"])
+            if ALLOWLIST_MARKER in text[line_start:line_end]:
+                continue
+            results.append((finding["rule"], finding["confidence"], line_no))
+    return results
+
+
+def format_findings(findings):
+    lines = [f"   - {rule}（第 {line_no} 行）" for rule, _, line_no in findings]
+    if len(findings) > MAX_REPORTED:
+        lines = lines[:MAX_REPORTED] + [f"   - ... 共 {len(findings)} 处"]
+    return "\n".join(lines)
+
+
+def main():
+    """主函数"""
+    try:
+        tool_use = read_payload(need_content=True)
+
+        tool = tool_use.get("tool_name") or tool_use.get("tool")
+        arguments = tool_use.get("tool_input") or tool_use.get("arguments", {})
+        file_path = arguments.get("file_path", "")
+
+        findings = find_secrets(collect_texts(tool, arguments))
+        if not findings:
+            sys.exit(0)
+
+        high = [finding for finding in findings if finding[1] == "high"]
+        if high:
+            block(
+                "secret-scanner",
+                f"🚨 检测到密钥，已阻止写入 {file_path}:\n"
+                f"{format_findings(high)}\n"
+                "💡 请改为从环境变量或密钥管理服务读取；"
+                f"确认是测试数据时，可在该行添加注释 `{ALLOWLIST_MARKER}`",
+            )
+
+        print(
+            f"⚠️ {file_path} 中可能包含敏感信息，请确认不是真实密钥:\n"
+            f"{format_findings(findings)}"
+        )
+        record_metric("secret-scanner", "warn")
+        sys.exit(0)
+
+    except Exception:
+        # 出错时不阻止操作
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    run_hook(main, "secret-scanner", fail_closed=True)
@@ -47,7 +47,7 @@ chmod +x "$HOOKS_DEST_DIR"/*.py
 chmod +x "$HOOKS_DEST_DIR"/*.sh
 
 # Count installed hooks
-HOOK_COUNT=$(ls -1 "$HOOKS_DEST_DIR"/*.{py,sh} 2>/dev/null | wc -l)
+HOOK_COUNT=$(ls -1 "$HOOKS_DEST_DIR"/*.{py,sh} 2>/dev/null | grep -v hook_utils | wc -l)
 echo -e "${GREEN}✓ Installed $HOOK_COUNT hooks${NC}"
 
 # Handle configuration
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Hook Batch Runner - 批量JSONL模式运行hooks
+从JSONL流中逐行读取tool_use数据，在进程内运行hooks，并按输入顺序为每条输入输出一条判定记录。
+用于历史命令回溯校验、规则变更影响分析等场景，避免每条记录都启动一次hook进程。
+
+用法:
+    hook-batch.py --hook git-safety-check ~/.claude/logs/commands_20250105.log
+    cat payloads.jsonl | hook-batch.py --workers 8 > verdicts.jsonl
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+DEFAULT_HOOKS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hooks"
+)
+
+# 审计类hook会写日志，回放历史记录时默认不运行，需要通过 --hook 显式指定
+SIDE_EFFECT_HOOKS = ["command-logger", "dev-event-notifier"]
+
+# 当前进程已加载的hooks: [(name, main)]
+_loaded_hooks = []
+
+
+def discover_hooks(hooks_dir):
+    """列出目录中的Python hook名称（不含扩展名）"""
+    names = []
+    for filename in sorted(os.listdir(hooks_dir)):
+        name, ext = os.path.splitext(filename)
+        if ext == ".py" and name not in SIDE_EFFECT_HOOKS:
+            names.append(name)
+    return names
+
+
+def load_hook(hooks_dir, name):
+    """以模块方式加载hook脚本，返回其main函数（没有main的辅助模块返回None）"""
+    path = os.path.join(hooks_dir, f"{name}.py")
+    module_name = "hook_" + name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, "main", None)
+
+
+def init_hooks(hooks_dir, names):
+    """加载hooks（同时作为进程池的initializer）"""
+    # hooks之间可能共享辅助模块，需要能从hooks目录导入
+    if hooks_dir not in sys.path:
+        sys.path.insert(0, hooks_dir)
+    # 回放历史记录不应写入实时的判定指标，也不应读写会话的提示去重状态（否则结果取决于记录顺序和之前的运行）
+    os.environ["CLAUDE_HOOKS_NO_METRICS"] = "1"
+    os.environ["CLAUDE_HOOKS_NO_ADVISORY_DEDUPE"] = "1"
+
+    _loaded_hooks.clear()
+    for name in names:
+        main = load_hook(hooks_dir, name)
+        if callable(main):
+            _loaded_hooks.append((name, main))
+
+
+def normalize_payload(record):
+    """将command-logger的日志条目转换为tool_use格式，其余记录原样返回"""
+    if "tool_input" in record or "arguments" in record:
+        return record
+
+    tool_input = {}
+    if "command" in record:
+        tool_input["command"] = record["command"]
+    if "file" in record:
+        tool_input["file_path"] = record["file"]
+    for key in ("pattern", "path"):
+        if key in record:
+            tool_input[key] = record[key]
+
+    return {
+        "tool_name": record.get("tool_name") or record.get("tool"),
+        "tool_input": tool_input,
+    }
+
+
+def run_hook(main, payload_text):
+    """在进程内运行单个hook，返回 (退出码, stdout, stderr)"""
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    saved_stdin = sys.stdin
+    sys.stdin = io.StringIO(payload_text)
+    exit_code = 0
+
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            main()
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            stderr.write(str(e.code))
+            exit_code = 1
+    except Exception as e:
+        stderr.write(f"{type(e).__name__}: {e}")
+        exit_code = 1
+    finally:
+        sys.stdin = saved_stdin
+
+    return exit_code, stdout.getvalue().strip(), stderr.getvalue().strip()
+
+
+def classify(exit_code, stdout):
+    """根据退出码判定结果: block / warn / allow / error"""
+    if exit_code == 2:
+        return "block"
+    if exit_code != 0:
+        return "error"
+    return "warn" if stdout else "allow"
+
+
+def evaluate_line(numbered_line):
+    """对一行输入运行所有hooks，返回判定记录（空行返回None）"""
+    line_no, line = numbered_line
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("not a JSON object")
+    except ValueError as e:
+        return {"line": line_no, "decision": "error", "error": f"无效的JSON: {e}"}
+
+    payload = normalize_payload(record)
+    payload_text = json.dumps(payload, ensure_ascii=False)
+
+    verdicts = []
+    for name, main in _loaded_hooks:
+        exit_code, stdout, stderr = run_hook(main, payload_text)
+        verdict = {
+            "hook": name,
+            "exit_code": exit_code,
+            "decision": classify(exit_code, stdout),
+        }
+        if stdout:
+            verdict["stdout"] = stdout
+        if stderr:
+            verdict["stderr"] = stderr
+        verdicts.append(verdict)
+
+    decisions = {verdict["decision"] for verdict in verdicts}
+    for decision in ("block", "error", "warn"):
+        if decision in decisions:
+            break
+    else:
+        decision = "allow"
+
+    result = {
+        "line": line_no,
+        "decision": decision,
+        "tool": payload.get("tool_name") or payload.get("tool"),
+    }
+    if "timestamp" in record:
+        result["timestamp"] = record["timestamp"]
+    result["verdicts"] = verdicts
+    return result
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="批量运行hooks: 读取JSONL格式的tool_use数据，按输入顺序输出判定记录"
+    )
+    parser.add_argument(
+        "input", nargs="?", default="-", help="输入JSONL文件（默认读取stdin）"
+    )
+    parser.add_argument(
+        "--hook",
+        action="append",
+        dest="hooks",
+        help="要运行的hook名称，可重复指定（默认运行除审计类外的全部hooks）",
+    )
+    parser.add_argument("--hooks-dir", default=DEFAULT_HOOKS_DIR, help="hooks目录")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="并行进程数（默认1，即单进程）"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=256, help="每次分发给子进程的记录数"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="输出JSONL文件（默认写入stdout）"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    hooks_dir = os.path.abspath(args.hooks_dir)
+    names = args.hooks or discover_hooks(hooks_dir)
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    outfile = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+
+    counts = {}
+    with contextlib.ExitStack() as stack:
+        if infile is not sys.stdin:
+            stack.enter_context(infile)
+        if outfile is not sys.stdout:
+            stack.enter_context(outfile)
+
+        lines = enumerate(infile, 1)
+        if args.workers > 1:
+            pool = stack.enter_context(
+                Pool(args.workers, initializer=init_hooks, initargs=(hooks_dir, names))
+            )
+            # imap保证结果按输入顺序返回
+            results = pool.imap(evaluate_line, lines, chunksize=args.chunksize)
+        else:
+            init_hooks(hooks_dir, names)
+            results = map(evaluate_line, lines)
+
+        for result in results:
+            if result is None:
+                continue
+            counts[result["decision"]] = counts.get(result["decision"], 0) + 1
+            outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    summary = ", ".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+    print(f"📊 处理完成 - {summary or '无输入'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
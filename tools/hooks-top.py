@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Hooks Top - 实时查看工具调用和hook判定
+增量跟踪当天的 commands / events / metrics 日志（记录偏移量并轮询文件大小，不会重复读取整个文件），
+在固定内存内维护按工具、hook判定和事件类型统计的滚动速率，每秒刷新一次。
+
+用法:
+    hooks-top.py                 # 只显示启动之后的活动
+    hooks-top.py --backfill      # 先读入当天已有的日志
+    hooks-top.py --once --backfill   # 输出一次快照后退出
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+LOG_DIR = os.path.expanduser("~/.claude/logs")
+
+# (分区标题, 日志目录, 文件名前缀, 记录 -> 统计键)
+SOURCES = [
+    ("🔧 工具调用", "", "commands", lambda record: record.get("tool")),
+    (
+        "🛡️ Hook判定",
+        "metrics",
+        "metrics",
+        lambda record: f"{record.get('hook')}: {record.get('verdict')}",
+    ),
+    ("📝 开发事件", "events", "events", lambda record: record.get("event_type")),
+]
+
+# 每次轮询单个文件最多读取的字节数，避免积压时一次读入过多
+MAX_READ_BYTES = 4 * 1024 * 1024
+# 跨天后继续读取前一天日志文件的时间（秒）
+ROLLOVER_GRACE = 60
+
+
+class LogFollower:
+    """按日期跟踪 <prefix>_YYYYMMDD.log，只读取上次偏移量之后新追加的内容
+
+    跨天切换到新文件时先把旧文件读到结尾；切换后的 ROLLOVER_GRACE 秒内继续读取旧文件，
+    午夜前开始、午夜后才写完的hook进程追加的记录也不会丢失。
+    """
+
+    def __init__(self, log_dir, prefix, backfill):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.backfill = backfill
+        self.path = None
+        self.offset = 0
+        self.partial = b""
+        # 跨天前的文件: [路径, 偏移量, 未完成的行, 停止读取的时间]
+        self.previous = None
+
+    def current_path(self):
+        filename = f"{self.prefix}_{datetime.now().strftime('%Y%m%d')}.log"
+        return os.path.join(self.log_dir, filename)
+
+    def poll(self):
+        """返回新追加的完整记录列表"""
+        records = []
+        path = self.current_path()
+        if path != self.path:
+            # 首次启动或跨天切换到新文件
+            first = self.path is None
+            if not first:
+                self.previous = [
+                    self.path,
+                    self.offset,
+                    self.partial,
+                    time.monotonic() + ROLLOVER_GRACE,
+                ]
+            self.path = path
+            self.partial = b""
+            self.offset = 0
+            if first and not self.backfill:
+                try:
+                    self.offset = os.path.getsize(path)
+                except OSError:
+                    pass
+
+        if self.previous:
+            old_path, old_offset, old_partial, until = self.previous
+            # 读到旧文件结尾
+            while True:
+                new_records, new_offset, old_partial = read_records(
+                    old_path, old_offset, old_partial
+                )
+                records.extend(new_records)
+                if new_offset == old_offset:
+                    break
+                old_offset = new_offset
+            if time.monotonic() > until:
+                self.previous = None
+            else:
+                self.previous = [old_path, old_offset, old_partial, until]
+
+        new_records, self.offset, self.partial = read_records(
+            self.path, self.offset, self.partial
+        )
+        records.extend(new_records)
+        return records
+
+
+def read_records(path, offset, partial):
+    """读取path中offset之后新追加的完整记录，返回 (记录列表, 新偏移量, 未完成的行)"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return [], offset, partial
+    if size < offset:
+        # 文件被截断或替换，从头开始读
+        offset = 0
+        partial = b""
+    if size == offset:
+        return [], offset, partial
+
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(min(size - offset, MAX_READ_BYTES))
+    except OSError:
+        return [], offset, partial
+    offset += len(data)
+
+    lines = (partial + data).split(b"\n")
+    # 最后一段可能是还没写完的行
+    partial = lines.pop()
+
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records, offset, partial
+
+
+class RollingCounter:
+    """固定窗口（按秒分桶）的滚动计数，键的数量有上限，内存占用固定"""
+
+    def __init__(self, window, max_keys):
+        self.window = window
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.totals = {}
+        self.current = int(time.time())
+
+    def advance(self, now):
+        """把时间推进到now，清空已滑出窗口的桶"""
+        now = int(now)
+        if now <= self.current:
+            return
+        expired = min(now - self.current, self.window)
+        for counts in self.buckets.values():
+            for second in range(now - expired + 1, now + 1):
+                counts[second % self.window] = 0
+        self.current = now
+
+    def add(self, key, timestamp):
+        second = int(timestamp)
+        if second <= self.current - self.window or second > self.current:
+            # 超出窗口的记录只计入总数
+            second = None
+
+        if key not in self.buckets:
+            if len(self.buckets) >= self.max_keys:
+                # 淘汰窗口内计数最少的键
+                evicted = min(self.buckets, key=lambda k: sum(self.buckets[k]))
+                del self.buckets[evicted]
+                self.totals.pop(evicted, None)
+            self.buckets[key] = [0] * self.window
+        if second is not None:
+            self.buckets[key][second % self.window] += 1
+        self.totals[key] = self.totals.get(key, 0) + 1
+
+    def rows(self, limit):
+        """返回按窗口内计数排序的 [(键, 窗口内计数, 总数)]"""
+        rows = [
+            (key, sum(counts), self.totals.get(key, 0))
+            for key, counts in self.buckets.items()
+        ]
+        rows.sort(key=lambda row: (row[1], row[2]), reverse=True)
+        return rows[:limit]
+
+
+def record_time(record, now):
+    """解析记录的时间戳，无法解析时使用当前时间"""
+    try:
+        return datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+    except (KeyError, TypeError, ValueError):
+        return now
+
+
+def render(sections, window, limit, started):
+    """渲染当前统计"""
+    lines = [
+        f"\033[1;36m🪝 Hooks Top\033[0m  {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        f"  窗口: {window}s  运行: {int(time.time() - started)}s",
+        "",
+    ]
+    for title, counter in sections:
+        lines.append(f"\033[1;33m{title}\033[0m")
+        lines.append(f"  {'名称':<40} {'窗口内':>8} {'每分钟':>8} {'总计':>8}")
+        rows = counter.rows(limit)
+        if not rows:
+            lines.append("  (暂无数据)")
+        for key, count, total in rows:
+            per_minute = count * 60 / window
+            lines.append(
+                f"  {str(key)[:40]:<40} {count:>8} {per_minute:>8.1f} {total:>8}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="实时查看hook和工具调用活动")
+    parser.add_argument("--log-dir", default=LOG_DIR, help="日志目录")
+    parser.add_argument("--window", type=int, default=60, help="滚动窗口（秒）")
+    parser.add_argument("--interval", type=float, default=1.0, help="刷新间隔（秒）")
+    parser.add_argument("--limit", type=int, default=10, help="每个分区显示的行数")
+    parser.add_argument(
+        "--max-keys", type=int, default=256, help="每个分区最多跟踪的键数"
+    )
+    parser.add_argument(
+        "--backfill", action="store_true", help="启动时读入当天已有的日志"
+    )
+    parser.add_argument("--once", action="store_true", help="输出一次快照后退出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    started = time.time()
+
+    followers = []
+    sections = []
+    for title, subdir, prefix, key_func in SOURCES:
+        follower = LogFollower(
+            os.path.join(args.log_dir, subdir), prefix, args.backfill
+        )
+        counter = RollingCounter(args.window, args.max_keys)
+        followers.append((follower, counter, key_func))
+        sections.append((title, counter))
+
+    try:
+        while True:
+            now = time.time()
+            for follower, counter, key_func in followers:
+                counter.advance(now)
+                while True:
+                    records = follower.poll()
+                    for record in records:
+                        key = key_func(record)
+                        if key:
+                            counter.add(key, record_time(record, now))
+                    # 快照模式下读完积压的日志再输出
+                    if not args.once or not records:
+                        break
+
+            output = render(sections, args.window, args.limit, started)
+            if args.once:
+                print(output)
+                return
+            # 清屏后重绘
+            sys.stdout.write("\033[H\033[2J" + output + "\n")
+            sys.stdout.flush()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Log Collector - 本地测试用的日志收集服务
+接收 log-shipper.py 发送的gzip压缩NDJSON批次，按批次ID去重后追加到输出目录的
+<主机>/<来源>.log 中。可以注入失败（随机返回503、延迟响应）来测试spool、退避和重试。
+
+用法:
+    log-collector.py --port 8765 --output-dir /tmp/collected
+    log-collector.py --fail-rate 0.3 --delay 2     # 30%的请求返回503，每个请求延迟2秒
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Collector:
+    """保存收到的批次，已收到的批次ID记录在 batches.txt 中，重启后也能去重"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.ids_path = os.path.join(output_dir, "batches.txt")
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            with open(self.ids_path, encoding="utf-8") as f:
+                self.seen = {line.strip() for line in f if line.strip()}
+        except OSError:
+            self.seen = set()
+        self.stats = {"batches": 0, "records": 0, "duplicates": 0, "failed": 0}
+
+    def store(self, batch_id, host, source, lines):
+        """保存一个批次，返回是否为重复批次"""
+        with self.lock:
+            if batch_id in self.seen:
+                self.stats["duplicates"] += 1
+                return True
+            directory = os.path.join(self.output_dir, host)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{source}.log"), "ab") as f:
+                f.write(b"".join(line + b"\n" for line in lines))
+            # 先写数据再记录批次ID：中途崩溃时批次会被再次接收，而不是丢失
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write(batch_id + "\n")
+            self.seen.add(batch_id)
+            self.stats["batches"] += 1
+            self.stats["records"] += len(lines)
+            return False
+
+
+def make_handler(collector, fail_rate, delay, quiet):
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.reply(200, collector.stats)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if delay:
+                time.sleep(delay)
+            if random.random() < fail_rate:
+                collector.stats["failed"] += 1
+                self.reply(503, {"error": "injected failure"})
+                return
+
+            batch_id = self.headers.get("X-Batch-Id", "")
+            host = self.headers.get("X-Log-Host", "unknown")
+            source = self.headers.get("X-Log-Source", "unknown")
+            if not re.fullmatch(r"[0-9a-f]{8,64}", batch_id):
+                self.reply(400, {"error": "missing or invalid X-Batch-Id"})
+                return
+            # 主机名和来源用作路径，只允许安全字符
+            host = re.sub(r"[^A-Za-z0-9_.-]", "_", host)
+            source = re.sub(r"[^A-Za-z0-9_.-]", "_", source)
+
+            try:
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                lines = [line for line in body.split(b"\n") if line.strip()]
+                for line in lines:
+                    json.loads(line)
+            except (OSError, EOFError, ValueError) as e:
+                self.reply(400, {"error": f"invalid payload: {e}"})
+                return
+
+            duplicate = collector.store(batch_id, host, source, lines)
+            self.reply(200, {"accepted": len(lines), "duplicate": duplicate})
+
+        def log_message(self, format, *args):
+            if not quiet:
+                sys.stderr.write(f"📥 {self.address_string()} {format % args}\n")
+
+    return Handler
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="本地测试用的日志收集服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument(
+        "--output-dir", default="./collected-logs", help="保存收到的日志的目录"
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="随机返回503的比例（0-1）"
+    )
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--quiet", action="store_true", help="不输出请求日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+
+    collector = Collector(args.output_dir)
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(collector, args.fail_rate, args.delay, args.quiet),
+    )
+    print(
+        f"🛰️ 收集服务已启动: http://{args.host}:{args.port}/  输出目录: {args.output_dir}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = collector.stats
+        print(
+            f"\n📊 收到 {stats['batches']} 批（{stats['records']} 条记录），"
+            f"重复 {stats['duplicates']} 批，注入失败 {stats['failed']} 次"
+        )
+
+
+if __name__ == "__main__":
+    main()
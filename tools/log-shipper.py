@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Log Shipper - 把hook日志发送到中心收集服务
+按字节偏移量增量读取 ~/.claude/logs 下的 commands / events 日志，打包成gzip压缩的批次，
+先写入本地spool目录，再POST到HTTP收集服务。离线时批次留在spool中，按指数退避（带随机抖动）重试；
+spool超过大小上限时暂停读取新日志（日志仍保留在原文件中，恢复后从上次的偏移量继续）。
+
+偏移量和spool都保存在 ~/.claude/shipper/ 下，重启后从上次停止的位置继续。
+批次ID由主机名、日志文件和字节范围决定，重复发送同一批次时收集服务可以据此去重（至少一次投递）。
+
+本工具独立于hooks运行（cron、launchd、systemd或nohup），不会增加hook的延迟。
+
+用法:
+    log-shipper.py --url http://collector:8765/ingest
+    log-shipper.py --url http://127.0.0.1:8765/ingest --once
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，不做单实例保护
+    fcntl = None
+
+LOG_DIR = os.path.expanduser("~/.claude/logs")
+STATE_DIR = os.path.expanduser("~/.claude/shipper")
+
+# 日志来源: 名称 -> (日志子目录, 文件名前缀)
+SOURCES = {
+    "commands": ("", "commands"),
+    "events": ("events", "events"),
+    "metrics": ("metrics", "metrics"),
+}
+DEFAULT_SOURCES = ["commands", "events"]
+
+# 重试间隔的上下限（秒）
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+
+# 收集服务返回这些状态码时稍后重试，其余4xx视为批次本身有问题
+RETRY_STATUS = {408, 429}
+
+
+def atomic_write(path, data):
+    """先写临时文件再rename，避免崩溃时留下半个文件"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class Spool:
+    """本地批次队列: 每个批次一个文件（一行JSON元数据 + gzip压缩的NDJSON），按文件名顺序发送"""
+
+    def __init__(self, state_dir, limit_bytes):
+        self.dir = os.path.join(state_dir, "spool")
+        self.rejected_dir = os.path.join(state_dir, "rejected")
+        self.limit_bytes = limit_bytes
+        self.bytes = None
+        os.makedirs(self.dir, exist_ok=True)
+
+    def batches(self):
+        try:
+            names = sorted(
+                name for name in os.listdir(self.dir) if name.endswith(".batch")
+            )
+        except OSError:
+            return []
+        return [os.path.join(self.dir, name) for name in names]
+
+    def size(self):
+        if self.bytes is None:
+            self.bytes = 0
+            for path in self.batches():
+                try:
+                    self.bytes += os.path.getsize(path)
+                except OSError:
+                    continue
+        return self.bytes
+
+    def full(self):
+        return self.size() >= self.limit_bytes
+
+    def add(self, batch_id, meta, payload):
+        """写入一个批次，文件名以时间戳开头以保持发送顺序"""
+        name = f"{time.time_ns():020d}-{batch_id}.batch"
+        data = json.dumps(meta).encode("utf-8") + b"\n" + gzip.compress(payload)
+        atomic_write(os.path.join(self.dir, name), data)
+        self.bytes = self.size() + len(data)
+
+    @staticmethod
+    def read(path):
+        """读取批次，返回 (元数据, gzip压缩的内容)"""
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            return meta, f.read()
+
+    def remove(self, path, rejected=False):
+        """删除已发送的批次；收集服务明确拒绝的批次移到rejected目录，避免一直阻塞队列"""
+        size = os.path.getsize(path)
+        if rejected:
+            os.makedirs(self.rejected_dir, exist_ok=True)
+            os.replace(path, os.path.join(self.rejected_dir, os.path.basename(path)))
+        else:
+            os.unlink(path)
+        if self.bytes is not None:
+            self.bytes -= size
+
+
+class Shipper:
+    def __init__(self, args):
+        self.url = args.url
+        self.token = os.environ.get("CLAUDE_LOG_COLLECTOR_TOKEN")
+        self.log_dir = args.log_dir
+        self.sources = args.sources or DEFAULT_SOURCES
+        self.batch_lines = args.batch_lines
+        self.batch_bytes = args.batch_kb * 1024
+        self.from_end = args.from_end
+        self.timeout = args.timeout
+        self.host = socket.gethostname()
+        self.state_path = os.path.join(args.state_dir, "state.json")
+        self.spool = Spool(args.state_dir, args.spool_limit_mb * 1024 * 1024)
+        self.state = self.load_state()
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.stats = {"spooled": 0, "sent": 0, "records": 0, "failed": 0}
+
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if isinstance(state, dict) and isinstance(state.get("offsets"), dict):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"offsets": {}}
+
+    def save_state(self):
+        atomic_write(self.state_path, json.dumps(self.state).encode("utf-8"))
+
+    def log_files(self):
+        """按日期顺序列出要发送的日志文件: [(来源, 路径)]"""
+        files = []
+        for source in self.sources:
+            subdir, prefix = SOURCES[source]
+            directory = os.path.join(self.log_dir, subdir)
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                continue
+            for name in names:
+                if re.fullmatch(rf"{prefix}_\d{{8}}\.log", name):
+                    files.append((source, os.path.join(directory, name)))
+        return files
+
+    def read_batch(self, path, offset):
+        """从offset开始读取完整的行，返回 (内容, 新偏移量, 行数)"""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(self.batch_bytes)
+        # 只发送完整的行，最后一行可能还没写完
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            if len(data) < self.batch_bytes:
+                return b"", offset, 0
+            # 单行超过批次大小，整行读取
+            with open(path, "rb") as f:
+                f.seek(offset)
+                line = f.readline()
+            if not line.endswith(b"\n"):
+                return b"", offset, 0
+            return line, offset + len(line), 1
+
+        data = data[:end]
+        lines = data.split(b"\n")[:-1]
+        if len(lines) > self.batch_lines:
+            lines = lines[: self.batch_lines]
+            data = b"\n".join(lines) + b"\n"
+        return data, offset + len(data), len(lines)
+
+    def tail(self):
+        """把新日志打包写入spool，spool已满时停止（背压），返回写入的批次数"""
+        offsets = self.state["offsets"]
+        created = 0
+        # --from-end只对第一次运行时已存在的文件生效，之后新建的日志文件都从头发送
+        skip_existing = self.from_end and not self.state.get("started")
+        self.state["started"] = True
+        for source, path in self.log_files():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if path not in offsets:
+                offsets[path] = size if skip_existing else 0
+            if size < offsets[path]:
+                # 文件被截断或替换，从头开始
+                offsets[path] = 0
+
+            while offsets[path] < size:
+                if self.spool.full():
+                    return created
+                start = offsets[path]
+                data, end, count = self.read_batch(path, start)
+                if not count:
+                    break
+                # 批次ID由主机、文件和字节范围决定，崩溃后重新生成的批次ID相同
+                batch_id = hashlib.sha1(
+                    f"{self.host}:{path}:{start}:{end}".encode("utf-8")
+                ).hexdigest()[:20]
+                meta = {
+                    "batch_id": batch_id,
+                    "host": self.host,
+                    "source": source,
+                    "file": os.path.basename(path),
+                    "offset": start,
+                    "records": count,
+                }
+                # 先写spool再更新偏移量：中途崩溃最多重复一个批次，不会丢失
+                self.spool.add(batch_id, meta, data)
+                offsets[path] = end
+                self.save_state()
+                created += 1
+                self.stats["spooled"] += 1
+
+        # 清理已经不存在的文件的偏移量
+        existing = {path for _, path in self.log_files()}
+        for path in [path for path in offsets if path not in existing]:
+            del offsets[path]
+        return created
+
+    def send(self, meta, payload):
+        """发送一个批次，返回 "ok" / "retry" / "reject" """
+        request = urllib.request.Request(
+            self.url,
+            data=payload,
+            method="POST",
+            headers={
+                "Content-Type": "application/x-ndjson",
+                "Content-Encoding": "gzip",
+                "X-Batch-Id": meta["batch_id"],
+                "X-Log-Host": meta["host"],
+                "X-Log-Source": meta["source"],
+                "X-Log-File": meta["file"],
+            },
+        )
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            return "ok"
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code not in RETRY_STATUS:
+                print(
+                    f"❌ 批次 {meta['batch_id']} 被拒绝: HTTP {e.code}", file=sys.stderr
+                )
+                return "reject"
+            print(f"⚠️ 发送失败: HTTP {e.code}", file=sys.stderr)
+        except (urllib.error.URLError, OSError) as e:
+            print(f"⚠️ 发送失败: {getattr(e, 'reason', e)}", file=sys.stderr)
+        return "retry"
+
+    def flush(self):
+        """按顺序发送spool中的批次，失败时进入退避，返回是否已全部发送"""
+        if time.monotonic() < self.next_attempt:
+            return False
+        for path in self.spool.batches():
+            try:
+                meta, payload = self.spool.read(path)
+            except (OSError, ValueError):
+                # 损坏的批次
+                self.spool.remove(path, rejected=True)
+                continue
+
+            result = self.send(meta, payload)
+            if result == "retry":
+                self.failures += 1
+                self.stats["failed"] += 1
+                # 指数退避 + 随机抖动，避免大量机器同时重试
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+                delay = random.uniform(delay / 2, delay)
+                self.next_attempt = time.monotonic() + delay
+                print(f"   {delay:.1f}s 后重试", file=sys.stderr)
+                return False
+
+            if result == "reject":
+                self.spool.remove(path, rejected=True)
+            else:
+                self.spool.remove(path)
+                self.stats["sent"] += 1
+                self.stats["records"] += meta.get("records", 0)
+            self.failures = 0
+        return True
+
+    def run_once(self):
+        """读取并发送直到spool清空或收集服务不可用，返回是否全部发送"""
+        while True:
+            created = self.tail()
+            if not self.flush():
+                return False
+            if not created:
+                return True
+
+    def run(self, interval):
+        while True:
+            self.tail()
+            self.flush()
+            time.sleep(interval)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="把hook日志发送到HTTP收集服务")
+    parser.add_argument(
+        "--url",
+        default=os.environ.get("CLAUDE_LOG_COLLECTOR_URL"),
+        help="收集服务地址（默认读取 CLAUDE_LOG_COLLECTOR_URL）",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        dest="sources",
+        choices=sorted(SOURCES),
+        help="要发送的日志，可重复指定（默认commands和events）",
+    )
+    parser.add_argument("--log-dir", default=LOG_DIR, help="日志目录")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="偏移量和spool目录")
+    parser.add_argument(
+        "--batch-lines", type=int, default=1000, help="每个批次最多的记录数"
+    )
+    parser.add_argument(
+        "--batch-kb", type=int, default=512, help="每个批次最多读取的原始字节数（KB）"
+    )
+    parser.add_argument(
+        "--spool-limit-mb",
+        type=int,
+        default=100,
+        help="spool大小上限（MB），超过后暂停读取新日志",
+    )
+    parser.add_argument("--interval", type=float, default=5.0, help="轮询间隔（秒）")
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="单次请求超时（秒）"
+    )
+    parser.add_argument(
+        "--from-end",
+        action="store_true",
+        help="第一次遇到的日志文件从末尾开始（不发送历史记录）",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="发送完当前日志后退出，适合cron"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    if not args.url:
+        print(
+            "❌ 请通过 --url 或 CLAUDE_LOG_COLLECTOR_URL 指定收集服务地址",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    lock_file = open(os.path.join(args.state_dir, "shipper.lock"), "w")
+    if fcntl:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("❌ 已有另一个log-shipper在运行", file=sys.stderr)
+            sys.exit(1)
+
+    shipper = Shipper(args)
+    try:
+        if args.once:
+            done = shipper.run_once()
+            stats = shipper.stats
+            print(
+                f"📦 打包 {stats['spooled']} 批，发送 {stats['sent']} 批"
+                f"（{stats['records']} 条记录），失败 {stats['failed']} 次，"
+                f"spool剩余 {len(shipper.spool.batches())} 批"
+            )
+            sys.exit(0 if done else 1)
+        shipper.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Hook Stress Test - 多会话并发压力测试
+以不同并发度同时启动大量hook进程（使用合成的tool_use数据），然后校验日志完整性：
+每条记录都是完整的JSON、没有丢失或重复、记录的时间戳与所在的日期文件一致；
+并报告随并发度增长的hook延迟，用来评估按天写单个日志文件这一设计的扩展上限。
+最后以最高并发度再运行一轮跨午夜测试：各hook进程通过一个小的启动脚本运行，在进程内替换
+hook_utils.log_time，把日志时间交错设置在午夜前后，校验记录按时间戳分到两天的日志文件中，
+且没有丢失或被拆开。
+开始前还会在进程内用一个数MB的Write数据运行全部hook，校验只有声明需要写入内容的hook才会解码content。
+
+测试在临时HOME目录中进行，不会影响 ~/.claude/logs。
+
+用法:
+    stress-hooks.py --levels 1,10,50 --requests 500
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+DEFAULT_HOOKS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hooks"
+)
+
+# hook名称 -> (日志子目录, 日志文件前缀)
+LOGGING_HOOKS = {
+    "command-logger": ("", "commands"),
+    "dev-event-notifier": ("events", "events"),
+}
+
+# 每隔多少个请求生成一条超过管道缓冲区大小的长命令，检查长记录是否会被穿插
+LARGE_PAYLOAD_EVERY = 7
+LARGE_PAYLOAD_BYTES = 16 * 1024
+
+# 跨午夜测试中日志时间在午夜前后分布的范围（秒）
+MIDNIGHT_SPREAD = 1.0
+
+# 跨午夜测试的hook启动脚本: 参数为 hook路径 和 日志时间（Unix时间戳），
+# 替换 hook_utils.log_time 后按 __main__ 运行hook
+LOG_TIME_RUNNER = """
+import os, runpy, sys
+from datetime import datetime
+hook_path, timestamp = sys.argv[1], float(sys.argv[2])
+sys.argv = [hook_path]
+sys.path[0] = os.path.dirname(hook_path)
+import hook_utils
+hook_utils.log_time = lambda: datetime.fromtimestamp(timestamp)
+runpy.run_path(hook_path, run_name="__main__")
+"""
+
+# 按需解析检查中Write内容的大小
+LAZY_CONTENT_BYTES = 6 * 1024 * 1024
+
+
+def make_payload(level, index):
+    """生成带唯一标记的合成tool_use数据"""
+    marker = f"stress-{level}-{index}"
+    message = marker
+    if index % LARGE_PAYLOAD_EVERY == 0:
+        message += " " + "x" * LARGE_PAYLOAD_BYTES
+    payload = {
+        "session_id": f"stress-session-{index % 50}",
+        "tool_name": "Bash",
+        "tool_input": {"command": f"git commit -m '{message}'"},
+    }
+    return marker, json.dumps(payload)
+
+
+def check_lazy_payload(hooks_dir):
+    """在进程内用大Write数据运行全部hook，返回 (检查的hook数, 问题列表)
+
+    read_payload返回按需解析的LazyObject时，检查hook运行后tool_input中的content仍未被解码。
+    """
+    home = tempfile.mkdtemp(prefix="hook-stress-lazy-")
+    saved_environ = dict(os.environ)
+    saved_stdin = sys.stdin
+    os.environ.update(
+        HOME=home, CLAUDE_HOOKS_NO_METRICS="1", CLAUDE_HOOKS_NO_ADVISORY_DEDUPE="1"
+    )
+    if hooks_dir not in sys.path:
+        sys.path.insert(0, hooks_dir)
+
+    file_path = os.path.join(home, "large.py")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("x = 1\n")
+    line = 'print("a \\"quoted\\" line")\n'
+    payload = json.dumps(
+        {
+            "session_id": "stress-lazy",
+            "tool_name": "Write",
+            "tool_input": {
+                "file_path": file_path,
+                "content": line * (LAZY_CONTENT_BYTES // len(line)),
+            },
+        }
+    )
+
+    checked = 0
+    problems = []
+    try:
+        import hook_utils
+
+        payloads = []
+        read_payload = hook_utils.read_payload
+
+        def recording_read_payload(need_content=False):
+            payloads.append(read_payload(need_content))
+            return payloads[-1]
+
+        hook_utils.read_payload = recording_read_payload
+        for filename in sorted(os.listdir(hooks_dir)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".py" or name == "hook_utils":
+                continue
+            spec = importlib.util.spec_from_file_location(
+                "stress_" + name.replace("-", "_"), os.path.join(hooks_dir, filename)
+            )
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            if not callable(getattr(module, "main", None)):
+                continue
+
+            payloads.clear()
+            sys.stdin = io.StringIO(payload)
+            with contextlib.redirect_stdout(io.StringIO()):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    try:
+                        module.main()
+                    except SystemExit:
+                        pass
+                    except Exception as e:
+                        problems.append(f"{name}: 运行失败 {e!r}")
+            if not payloads or not isinstance(payloads[0], hook_utils.LazyObject):
+                # 未读取输入或声明了need_content的hook
+                continue
+            checked += 1
+            tool_input = payloads[0]._fields.get("tool_input")
+            if tool_input is not None and "content" in tool_input._fields:
+                problems.append(f"{name}: 解码了未使用的Write content")
+        hook_utils.read_payload = read_payload
+    finally:
+        sys.stdin = saved_stdin
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        shutil.rmtree(home, ignore_errors=True)
+    return checked, problems
+
+
+def next_midnight():
+    """下一个本地午夜的Unix时间戳"""
+    tomorrow = datetime.now() + timedelta(days=1)
+    return tomorrow.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def run_hook(command, payload, env):
+    """运行一次hook，返回 (延迟秒数, 退出码)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        command,
+        input=payload,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    return time.perf_counter() - start, result.returncode
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def verify_logs(home, hook_name, expected_markers, expected_days=()):
+    """校验日志文件，返回问题列表
+
+    expected_days为必须出现记录的日期（YYYYMMDD），用于确认跨午夜测试确实写入了两天的日志文件。
+    """
+    subdir, prefix = LOGGING_HOOKS[hook_name]
+    log_dir = os.path.join(home, ".claude", "logs", subdir)
+    problems = []
+    seen = {}
+    days = set()
+
+    try:
+        filenames = sorted(os.listdir(log_dir))
+    except OSError:
+        return [f"{hook_name}: 日志目录不存在 {log_dir}"]
+
+    for filename in filenames:
+        match = re.fullmatch(rf"{prefix}_(\d{{8}})\.log", filename)
+        if not match:
+            continue
+        file_day = match.group(1)
+        days.add(file_day)
+        with open(os.path.join(log_dir, filename), encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    problems.append(f"{hook_name}: {filename}:{line_no} 记录损坏")
+                    continue
+                record_day = record.get("timestamp", "")[:10].replace("-", "")
+                if record_day != file_day:
+                    problems.append(
+                        f"{hook_name}: {filename}:{line_no} 时间戳 {record.get('timestamp')} 不属于该日期文件"
+                    )
+                found = re.search(r"stress-\d+-\d+", record.get("command", ""))
+                if found:
+                    seen[found.group(0)] = seen.get(found.group(0), 0) + 1
+
+    missing = [marker for marker in expected_markers if marker not in seen]
+    duplicated = [marker for marker, count in seen.items() if count > 1]
+    if missing:
+        problems.append(f"{hook_name}: 丢失 {len(missing)} 条记录（如 {missing[0]}）")
+    if duplicated:
+        problems.append(
+            f"{hook_name}: 重复 {len(duplicated)} 条记录（如 {duplicated[0]}）"
+        )
+    for day in expected_days:
+        if day not in days:
+            problems.append(f"{hook_name}: 缺少日期文件 {prefix}_{day}.log")
+    return problems
+
+
+def run_level(hooks_dir, hooks, level, requests, midnight=None):
+    """以指定并发度运行一轮测试，返回 (统计结果, 问题列表)
+
+    指定midnight（Unix时间戳）时，各请求的日志时间交错分布在午夜前后 MIDNIGHT_SPREAD 秒内。
+    """
+    # 每轮使用全新的HOME，同时覆盖并发创建日志目录的情况
+    home = tempfile.mkdtemp(prefix=f"hook-stress-{level}-")
+    env = dict(os.environ, HOME=home)
+    env.pop("CLAUDE_HOOKS_NO_METRICS", None)
+
+    jobs = []
+    markers = []
+    expected_days = ()
+    if midnight is not None:
+        expected_days = [
+            datetime.fromtimestamp(midnight + offset).strftime("%Y%m%d")
+            for offset in (-MIDNIGHT_SPREAD, 0)
+        ]
+    for index in range(requests):
+        marker, payload = make_payload(level, index)
+        markers.append(marker)
+        for hook in hooks:
+            command = [sys.executable, os.path.join(hooks_dir, f"{hook}.py")]
+            if midnight is not None:
+                # 相邻请求交替落在午夜前后，使两个日期文件被并发写入
+                offset = MIDNIGHT_SPREAD * ((index % 20) - 10) / 10
+                command[1:1] = ["-c", LOG_TIME_RUNNER]
+                command.append(str(midnight + offset))
+            jobs.append((command, payload, env))
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            results = list(executor.map(lambda job: run_hook(*job), jobs))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _ in results]
+        failures = sum(1 for _, code in results if code != 0)
+        problems = []
+        for hook in hooks:
+            if hook in LOGGING_HOOKS:
+                problems.extend(verify_logs(home, hook, markers, expected_days))
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    stats = {
+        "level": level,
+        "invocations": len(jobs),
+        "throughput": len(jobs) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "max": max(latencies) * 1000 if latencies else 0.0,
+        "failures": failures,
+    }
+    return stats, problems
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="hook并发压力测试")
+    parser.add_argument(
+        "--levels", default="1,10,25,50", help="并发度列表，逗号分隔（默认1,10,25,50）"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="每轮的合成请求数（默认200）"
+    )
+    parser.add_argument(
+        "--hook",
+        action="append",
+        dest="hooks",
+        help="要测试的hook，可重复指定（默认为写日志的hooks）",
+    )
+    parser.add_argument("--hooks-dir", default=DEFAULT_HOOKS_DIR, help="hooks目录")
+    parser.add_argument(
+        "--no-midnight", action="store_true", help="跳过跨午夜切换日志文件的测试"
+    )
+    return parser.parse_args(argv)
+
+
+def print_stats(stats):
+    print(
+        f"{stats['level']:>6} {stats['invocations']:>8} {stats['throughput']:>12.1f} "
+        f"{stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} "
+        f"{stats['max']:>9.1f} {stats['failures']:>6}"
+    )
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    hooks = args.hooks or list(LOGGING_HOOKS)
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    checked, problems = check_lazy_payload(args.hooks_dir)
+    print(f"📦 大输入按需解析检查: {checked} 个hook，问题 {len(problems)} 个")
+    print(f"🧪 hooks: {', '.join(hooks)}  每轮请求数: {args.requests}")
+    print(
+        f"{'并发':>6} {'调用数':>8} {'吞吐(次/秒)':>12} {'p50(ms)':>9} "
+        f"{'p95(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9} {'失败':>6}"
+    )
+
+    all_problems = [f"[按需解析] {problem}" for problem in problems]
+    for level in levels:
+        stats, problems = run_level(args.hooks_dir, hooks, level, args.requests)
+        print_stats(stats)
+        all_problems.extend(f"[并发 {level}] {problem}" for problem in problems)
+
+    if levels and not args.no_midnight:
+        level = max(levels)
+        print(f"🕛 跨午夜测试（并发 {level}）")
+        stats, problems = run_level(
+            args.hooks_dir, hooks, level, args.requests, midnight=next_midnight()
+        )
+        print_stats(stats)
+        all_problems.extend(f"[跨午夜] {problem}" for problem in problems)
+
+    if all_problems:
+        print("\n❌ 日志完整性检查失败:")
+        for problem in all_problems:
+            print(f"   {problem}")
+        sys.exit(1)
+
+    print("\n✅ 日志完整性检查通过: 所有记录完整、无丢失无重复，且位于正确的日期文件中")
+
+
+if __name__ == "__main__":
+    main()